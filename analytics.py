@@ -0,0 +1,270 @@
+"""
+📊 COHORT ANALYTICS OVER STORED RESULTS
+Streams the `user_data` table (Supabase, or a local Postgres/SQLite stand-in) in
+keyed pages and folds every row into running aggregates, so the full table is
+never held in memory. Each page also runs through the diagnostic rules in one
+vectorized pass, counting outcomes per rule. Summaries are cached on disk as JSON snapshots.
+
+    python analytics.py --sqlite local.db
+    python analytics.py --supabase          # uses SUPABASE_URL / SUPABASE_KEY
+"""
+import bisect
+import json
+import math
+import os
+import sqlite3
+import time
+
+import pandas as pd
+
+import logic
+
+PAGE_SIZE = 1000
+SNAPSHOT_PATH = "analytics_snapshot.json"
+SNAPSHOT_MAX_AGE = 6 * 3600  # seconds
+
+METRICS = ["practical_age", "gap_val", "extra_sip_req", "net_worth"]
+
+# Monthly in-hand income bands (same unit as the wizard input)
+INCOME_BANDS = [(50000, "< 50k"), (100000, "50k - 1L"), (200000, "1L - 2L"), (500000, "2L - 5L"), (math.inf, "5L+")]
+AGE_BANDS = [(25, "< 25"), (30, "25-29"), (35, "30-34"), (40, "35-39"), (50, "40-49"), (math.inf, "50+")]
+
+# Fixed histogram edges so distributions can be merged page by page
+HIST_EDGES = {
+    "practical_age": list(range(18, 101)),
+    "extra_sip_req": [0, 1, 5000, 10000, 25000, 50000, 100000, 250000, 500000, 1000000],
+}
+
+# ==========================================
+# 🔁 KEYED PAGE READERS
+# ==========================================
+def iter_supabase_rows(client, table="user_data", columns="*", page_size=PAGE_SIZE, start_after=None):
+    """Keyset pagination on `id` (no OFFSET scans)."""
+    last_id = start_after
+    while True:
+        query = client.table(table).select(columns).order("id").limit(page_size)
+        if last_id is not None:
+            query = query.gt("id", last_id)
+        page = query.execute().data or []
+        for row in page:
+            yield row
+        if len(page) < page_size:
+            return
+        last_id = page[-1]["id"]
+
+def iter_sql_rows(conn, table="user_data", columns="*", page_size=PAGE_SIZE, start_after=None):
+    """Keyset pagination for any DB-API connection (sqlite3, psycopg2, ...)."""
+    mark = "?" if isinstance(conn, sqlite3.Connection) else "%s"
+    last_id = start_after
+    while True:
+        cur = conn.cursor()
+        if last_id is None:
+            cur.execute(f"SELECT {columns} FROM {table} ORDER BY id LIMIT {mark}", (page_size,))
+        else:
+            cur.execute(f"SELECT {columns} FROM {table} WHERE id > {mark} ORDER BY id LIMIT {mark}", (last_id, page_size))
+        names = [d[0] for d in cur.description]
+        page = cur.fetchall()
+        cur.close()
+        for rec in page:
+            yield dict(zip(names, rec))
+        if len(page) < page_size:
+            return
+        last_id = page[-1][names.index("id")]
+
+def iter_rows(source, table="user_data", columns="*", page_size=PAGE_SIZE, start_after=None):
+    if hasattr(source, "table"):
+        return iter_supabase_rows(source, table, columns, page_size, start_after)
+    return iter_sql_rows(source, table, columns, page_size, start_after)
+
+def iter_pages(source, table="user_data", columns="*", page_size=PAGE_SIZE, start_after=None):
+    """Same keyed scan, grouped back into lists of at most `page_size` rows."""
+    page = []
+    for row in iter_rows(source, table, columns, page_size, start_after):
+        page.append(row)
+        if len(page) == page_size:
+            yield page
+            page = []
+    if page:
+        yield page
+
+# ==========================================
+# 🧮 INCREMENTAL AGGREGATES
+# ==========================================
+class RunningStats:
+    """Welford mean/variance with min/max; O(1) memory."""
+    def __init__(self):
+        self.n, self.mean, self.m2 = 0, 0.0, 0.0
+        self.min, self.max = math.inf, -math.inf
+
+    def add(self, x):
+        self.n += 1
+        d = x - self.mean
+        self.mean += d / self.n
+        self.m2 += d * (x - self.mean)
+        self.min = min(self.min, x)
+        self.max = max(self.max, x)
+
+    def to_dict(self):
+        if self.n == 0:
+            return {"count": 0}
+        std = math.sqrt(self.m2 / (self.n - 1)) if self.n > 1 else 0.0
+        return {"count": self.n, "mean": self.mean, "std": std, "min": self.min, "max": self.max}
+
+class Histogram:
+    """Counts over fixed edges; values beyond the last edge land in the final bin."""
+    def __init__(self, edges):
+        self.edges = edges
+        self.counts = [0] * len(edges)
+
+    def add(self, x):
+        self.counts[max(0, bisect.bisect_right(self.edges, x) - 1)] += 1
+
+    def quantile(self, q):
+        total = sum(self.counts)
+        if total == 0: return None
+        seen = 0
+        for edge, c in zip(self.edges, self.counts):
+            seen += c
+            if seen >= q * total:
+                return edge
+        return self.edges[-1]
+
+    def to_dict(self):
+        return {
+            "edges": self.edges, "counts": self.counts,
+            "p25": self.quantile(0.25), "p50": self.quantile(0.50), "p75": self.quantile(0.75)
+        }
+
+def _band(value, bands):
+    for upper, label in bands:
+        if value < upper: return label
+    return bands[-1][1]
+
+def income_band(row):
+    return _band(float(row.get("income") or 0), INCOME_BANDS)
+
+def age_band(row):
+    return _band(float(row.get("age") or 0), AGE_BANDS)
+
+DIMENSIONS = {
+    "persona": lambda row: row.get("persona") or "blank",
+    "income_band": income_band,
+    "age_band": age_band,
+    "currency": lambda row: row.get("currency") or "unknown",
+}
+
+class CohortReport:
+    """Folds rows into overall + per-cohort stats without keeping the rows."""
+    def __init__(self, dimensions=None, metrics=None):
+        self.dimensions = dimensions or DIMENSIONS
+        self.metrics = metrics or METRICS
+        self.rows = 0
+        self.overall = self._new_bucket()
+        self.cohorts = {dim: {} for dim in self.dimensions}
+
+    def _new_bucket(self):
+        bucket = {m: RunningStats() for m in self.metrics}
+        for m, edges in HIST_EDGES.items():
+            if m in self.metrics:
+                bucket[f"{m}_hist"] = Histogram(edges)
+        return bucket
+
+    def _fold(self, bucket, row):
+        for m in self.metrics:
+            val = row.get(m)
+            if val is None: continue
+            val = float(val)
+            bucket[m].add(val)
+            if f"{m}_hist" in bucket:
+                bucket[f"{m}_hist"].add(val)
+
+    def add(self, row):
+        self.rows += 1
+        self._fold(self.overall, row)
+        for dim, key_fn in self.dimensions.items():
+            key = key_fn(row)
+            if key not in self.cohorts[dim]:
+                self.cohorts[dim][key] = self._new_bucket()
+            self._fold(self.cohorts[dim][key], row)
+
+    def to_dict(self):
+        dump = lambda bucket: {k: v.to_dict() for k, v in bucket.items()}
+        return {
+            "rows": self.rows,
+            "generated_at": time.time(),
+            "overall": dump(self.overall),
+            "cohorts": {dim: {key: dump(b) for key, b in groups.items()} for dim, groups in self.cohorts.items()},
+        }
+
+class DiagnosticCounts:
+    """Outcome counts per diagnostic rule (see logic.py), one vectorized evaluation per page of rows."""
+    def __init__(self):
+        self.counts = {name: {} for name in logic.ALL_RULES}
+
+    def add_page(self, rows):
+        codes = logic.evaluate_rules(logic.profiles_from_rows(pd.DataFrame(rows)))
+        for name, rule in logic.ALL_RULES.items():
+            names = logic.status_names(rule)
+            for code, n in codes[name].value_counts().items():
+                outcome = names[int(code)]
+                self.counts[name][outcome] = self.counts[name].get(outcome, 0) + int(n)
+
+    def to_dict(self):
+        return self.counts
+
+def build_report(rows, dimensions=None, metrics=None):
+    report = CohortReport(dimensions, metrics)
+    for row in rows:
+        report.add(row)
+    return report.to_dict()
+
+# ==========================================
+# 💾 SUMMARY SNAPSHOTS
+# ==========================================
+def load_snapshot(path=SNAPSHOT_PATH, max_age=SNAPSHOT_MAX_AGE):
+    try:
+        with open(path) as f:
+            snap = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if time.time() - snap.get("generated_at", 0) > max_age:
+        return None
+    return snap
+
+def save_snapshot(summary, path=SNAPSHOT_PATH):
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(summary, f)
+    os.replace(tmp, path)
+
+def cohort_summary(source, path=SNAPSHOT_PATH, max_age=SNAPSHOT_MAX_AGE, refresh=False, page_size=PAGE_SIZE):
+    """Returns the cached snapshot if fresh, otherwise streams the table and rebuilds it."""
+    if not refresh:
+        snap = load_snapshot(path, max_age)
+        if snap is not None:
+            return snap
+    report, diagnostics = CohortReport(), DiagnosticCounts()
+    for page in iter_pages(source, page_size=page_size):
+        for row in page:
+            report.add(row)
+        diagnostics.add_page(page)
+    summary = report.to_dict()
+    summary["diagnostics"] = diagnostics.to_dict()
+    save_snapshot(summary, path)
+    return summary
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Cohort analytics over user_data")
+    parser.add_argument("--sqlite", help="Path to a local SQLite copy of user_data")
+    parser.add_argument("--supabase", action="store_true", help="Read from Supabase via SUPABASE_URL / SUPABASE_KEY")
+    parser.add_argument("--snapshot", default=SNAPSHOT_PATH)
+    parser.add_argument("--refresh", action="store_true")
+    args = parser.parse_args()
+
+    if args.supabase:
+        from supabase import create_client
+        src = create_client(os.environ["SUPABASE_URL"], os.environ["SUPABASE_KEY"])
+    else:
+        src = sqlite3.connect(args.sqlite or "user_data.db")
+    print(json.dumps(cohort_summary(src, args.snapshot, refresh=args.refresh), indent=2))
@@ -7,6 +7,13 @@ import math
 from supabase import create_client, Client
 import taxes       
 import calculator  
+import personas
+import results_store
+import share
+import statements
+import export
+import batch
+import returns_model
 
 # --- PAGE CONFIGURATION ---
 st.set_page_config(page_title="Financial Freedom Engine", page_icon="🚀", layout="wide", initial_sidebar_state="collapsed")
@@ -81,6 +88,17 @@ def init_connection():
 
 supabase = init_connection()
 
+# ==========================================
+# 🗄️ SHARED RESULT STORE (warmed with the persona cards)
+# ==========================================
+@st.cache_resource
+def get_result_store(engine_version, tax_version):
+    store = results_store.ResultStore()
+    store.warm(list(personas.PERSONAS.values()))
+    return store
+
+result_store = get_result_store(calculator.ENGINE_VERSION, taxes.TAX_VERSION)
+
 if 'user_id' not in st.session_state: st.session_state['user_id'] = str(uuid.uuid4())
 if 'step' not in st.session_state: st.session_state['step'] = 0
 
@@ -90,6 +108,12 @@ if 'db' not in st.session_state: st.session_state.db = {}
 def sync(key):
     st.session_state.db[key] = st.session_state[key]
 
+def apply_import(updates):
+    # Drop the widget state so the inputs re-read the imported values from the vault
+    for k, v in updates.items():
+        st.session_state.db[k] = v
+        st.session_state.pop(k, None)
+
 # ==========================================
 # 📈 CURRENCY FORMATTING LOGIC
 # ==========================================
@@ -117,37 +141,9 @@ def fmt_curr(num, symbol, is_inr_mode):
 # ==========================================
 # 🧑‍💻 PERSONA DATA LIBRARY
 # ==========================================
-h_options = ["Rent Forever", "Buy a Home", "Already Own"]
-
-personas_data = {
-    "techie": {
-        "age": 28, "retire_age": 55, "dependents": 2, "income": 150000, "living_expense": 40000, "rent": 35000,
-        "tax_slab_idx": 6, "use_post_tax": True, "cash": 100000, "fd": 0, "credit_limit": 450000, "emi": 0,
-        "term_insurance": 15000000, "health_insurance": 1000000, "epf": 300000, "mutual_funds": 800000, 
-        "stocks": 200000, "gold": 0, "arbitrage": 0, "fixed_income": 0, "step_up": 10, "inflation": 6.0, 
-        "housing_idx": 0, "house_cost": 15000000, "rent_inflation": 8.0, "rate_sip": 12.0, "rate_equity": 12.0, 
-        "rate_fd_gross": 7.0, "rate_epf": 8.1, "rate_gold": 8.0, "rate_arbitrage": 7.5, "rate_fixed": 7.5,
-        "current_sip": 40000, "monthly_pf": 14400
-    },
-    "family": {
-        "age": 36, "retire_age": 60, "dependents": 3, "income": 90000, "living_expense": 35000, "rent": 15000,
-        "tax_slab_idx": 4, "use_post_tax": True, "cash": 150000, "fd": 500000, "credit_limit": 200000, "emi": 15000,
-        "term_insurance": 10000000, "health_insurance": 500000, "epf": 1200000, "mutual_funds": 200000, 
-        "stocks": 50000, "gold": 100000, "arbitrage": 0, "fixed_income": 200000, "step_up": 5, "inflation": 6.0, 
-        "housing_idx": 1, "house_cost": 8000000, "rent_inflation": 8.0, "rate_sip": 11.0, "rate_equity": 11.0, 
-        "rate_fd_gross": 7.0, "rate_epf": 8.1, "rate_gold": 8.0, "rate_arbitrage": 7.5, "rate_fixed": 7.5,
-        "current_sip": 15000, "monthly_pf": 9600
-    },
-    "fire": {
-        "age": 32, "retire_age": 45, "dependents": 1, "income": 250000, "living_expense": 60000, "rent": 40000,
-        "tax_slab_idx": 6, "use_post_tax": True, "cash": 300000, "fd": 0, "credit_limit": 500000, "emi": 0,
-        "term_insurance": 20000000, "health_insurance": 2000000, "epf": 800000, "mutual_funds": 2500000, 
-        "stocks": 1000000, "gold": 0, "arbitrage": 0, "fixed_income": 0, "step_up": 15, "inflation": 6.0, 
-        "housing_idx": 0, "house_cost": 20000000, "rent_inflation": 8.0, "rate_sip": 13.0, "rate_equity": 13.0, 
-        "rate_fd_gross": 7.0, "rate_epf": 8.1, "rate_gold": 8.0, "rate_arbitrage": 7.5, "rate_fixed": 7.5,
-        "current_sip": 100000, "monthly_pf": 19200
-    }
-}
+h_options = calculator.HOUSING_OPTIONS
+
+personas_data = personas.PERSONAS
 
 def load_persona_to_state(persona_key, curr_choice):
     st.session_state['curr_choice'] = curr_choice
@@ -155,15 +151,18 @@ def load_persona_to_state(persona_key, curr_choice):
     
     st.session_state.db = {} 
     st.session_state.db["persona"] = persona_key
+    st.session_state.pop('goals_base', None)
     
     if persona_key == "blank":
         st.session_state.db.update({
             "age": 30, "retire_age": 60, "dependents": 2, "income": 0, "monthly_pf": 0, "living_expense": 0, "rent": 0,
-            "tax_slab_idx": 6 if is_inr_mode else 4, "use_post_tax": True, "cash": 0, "fd": 0, "credit_limit": 0, "emi": 0,
+            "tax_slab_idx": 6 if is_inr_mode else 4, "use_post_tax": True, "tax_regime": "new", "tax_deductions": 0, "cash": 0, "fd": 0, "credit_limit": 0, "emi": 0,
+            "loan_principal": 0, "loan_rate": 9.0 if is_inr_mode else 6.5, "loan_tenure": 0,
             "term_insurance": 0, "health_insurance": 0, "epf": 0, "mutual_funds": 0, "stocks": 0, "gold": 0, "arbitrage": 0, "fixed_income": 0, 
             "step_up": 10 if is_inr_mode else 5, 
             "inflation": 6.0 if is_inr_mode else 3.0, 
             "housing_idx": 0, "house_cost": 5000000 if is_inr_mode else 350000, 
+            "house_age": 0, "house_down_pct": 100, "house_loan_rate": 8.5 if is_inr_mode else 6.5, "house_loan_tenure": 20,
             "rent_inflation": 8.0 if is_inr_mode else 4.0, 
             "rate_sip": 12.0 if is_inr_mode else 8.0, 
             "rate_equity": 12.0 if is_inr_mode else 8.0, 
@@ -172,7 +171,7 @@ def load_persona_to_state(persona_key, curr_choice):
             "rate_gold": 8.0 if is_inr_mode else 5.0, 
             "rate_arbitrage": 7.5 if is_inr_mode else 4.5, 
             "rate_fixed": 7.5 if is_inr_mode else 4.5,
-            "current_sip": 0
+            "current_sip": 0, "goals": []
         })
     else:
         for k, v in personas_data[persona_key].items():
@@ -181,8 +180,26 @@ def load_persona_to_state(persona_key, curr_choice):
     st.session_state.step = 1
     st.rerun()
 
+CURRENCY_OPTIONS = ["🇮🇳 INR (₹)", "🇺🇸 USD ($)", "🇪🇺 EUR (€)", "🇬🇧 GBP (£)"]
 if 'curr_choice' not in st.session_state:
-    st.session_state['curr_choice'] = "🇮🇳 INR (₹)"
+    st.session_state['curr_choice'] = CURRENCY_OPTIONS[0]
+
+# 🔗 Opened from a shared plan link: load its vault and jump straight to the results
+plan_token = st.query_params.get("plan")
+if plan_token and plan_token != st.session_state.get('plan_token'):
+    st.session_state['plan_token'] = plan_token
+    try:
+        shared_db, shared_curr = share.decode_plan(plan_token, CURRENCY_OPTIONS)
+        st.session_state.db = shared_db
+        st.session_state['curr_choice'] = shared_curr
+        st.session_state.pop('goals_base', None)
+        st.session_state.step = 5
+    except ValueError:
+        st.warning("That plan link is broken or from an older version, so we couldn't open it.")
+
+# The goals editor edits a copy of db["goals"]: rebuild it from the vault on every visit to step 4
+if st.session_state.step != 4:
+    st.session_state.pop('goals_base', None)
 
 flag = st.session_state['curr_choice'].split(" ")[0]
 sym = st.session_state['curr_choice'].split("(")[1].replace(")", "")
@@ -208,7 +225,7 @@ if st.session_state.step == 0:
     
     col_c1, col_c2 = st.columns([1, 2])
     with col_c1:
-        curr = st.selectbox("🌎 Currency", ["🇮🇳 INR (₹)", "🇺🇸 USD ($)", "🇪🇺 EUR (€)", "🇬🇧 GBP (£)"])
+        curr = st.selectbox("🌎 Currency", CURRENCY_OPTIONS)
     
     st.markdown("<br>", unsafe_allow_html=True)
     
@@ -254,9 +271,16 @@ elif 1 <= st.session_state.step <= 4:
         c8.number_input("Monthly Rent", min_value=0, value=int(st.session_state.db.get("rent", 0)), key="rent", on_change=sync, args=("rent",))
         c8.caption(f"**{fmt_curr(st.session_state.db.get('rent', 0), sym, is_inr)}**")
         
-        tax_options = [0.0, 0.05, 0.10, 0.15, 0.20, 0.25, 0.30, 0.35, 0.40]
+        tax_options = calculator.TAX_SLAB_OPTIONS
         c9.selectbox("Tax Slab (Pre-Retirement)", options=range(len(tax_options)), format_func=lambda x: f"{int(tax_options[x]*100)}%", index=int(st.session_state.db.get("tax_slab_idx", 6)), key="tax_slab_idx", on_change=sync, args=("tax_slab_idx",))
         st.toggle("Calculate Post-Tax Returns automatically", value=bool(st.session_state.db.get("use_post_tax", True)), key="use_post_tax", on_change=sync, args=("use_post_tax",))
+        
+        if is_inr:
+            c10, c11 = st.columns(2)
+            regime_labels = {"new": "New Regime", "old": "Old Regime (with deductions)"}
+            c10.selectbox("Income Tax Regime", options=list(taxes.REGIMES), format_func=regime_labels.get, index=taxes.REGIMES.index(st.session_state.db.get("tax_regime", "new")), key="tax_regime", on_change=sync, args=("tax_regime",))
+            c11.number_input("Yearly Deductions (80C, 80D, HRA, Home-Loan Interest)", min_value=0, value=int(st.session_state.db.get("tax_deductions", 0)), key="tax_deductions", on_change=sync, args=("tax_deductions",), help="Only used under the Old Regime. After retirement, up to ₹2L of 80C/80D still counts against FD interest, plus ₹50k from age 60 (80TTB).")
+            c11.caption(f"**{fmt_curr(st.session_state.db.get('tax_deductions', 0), sym, is_inr)}**")
 
     # --- STEP 2: SAFETY ---
     elif st.session_state.step == 2:
@@ -281,11 +305,39 @@ elif 1 <= st.session_state.step <= 4:
         
         c6.number_input("Health Insurance Cover", min_value=0, value=int(st.session_state.db.get("health_insurance", 0)), key="health_insurance", on_change=sync, args=("health_insurance",))
         c6.caption(f"**{fmt_curr(st.session_state.db.get('health_insurance', 0), sym, is_inr)}**")
+        
+        st.markdown("**Loan Details** *(optional: lets the simulator pay down your loan year by year)*")
+        c7, c8, c9 = st.columns(3)
+        c7.number_input("Outstanding Loan Principal", min_value=0, value=int(st.session_state.db.get("loan_principal", 0)), key="loan_principal", on_change=sync, args=("loan_principal",))
+        c7.caption(f"**{fmt_curr(st.session_state.db.get('loan_principal', 0), sym, is_inr)}**")
+        c8.number_input("Loan Interest Rate %", min_value=0.0, max_value=40.0, value=float(st.session_state.db.get("loan_rate", 9.0)), key="loan_rate", on_change=sync, args=("loan_rate",))
+        c9.number_input("Remaining Tenure (Years)", min_value=0, max_value=40, value=int(st.session_state.db.get("loan_tenure", 0)), key="loan_tenure", on_change=sync, args=("loan_tenure",))
+        sched_emi = calculator.loan_emi(st.session_state.db.get("loan_principal", 0), st.session_state.db.get("loan_rate", 9.0) / 100.0, st.session_state.db.get("loan_tenure", 0))
+        if sched_emi > 0:
+            c9.caption(f"EMI on this schedule: **{fmt_curr(sched_emi, sym, is_inr)} / month**")
 
     # --- STEP 3: ASSETS ---
     elif st.session_state.step == 3:
         st.subheader("3️⃣ Invested Assets Corpus")
         
+        with st.expander("📥 Import from account statements (CSV / XLSX)"):
+            uploads = st.file_uploader("Consolidated account statements or broker exports (transactions or holdings)", type=["csv", "tsv", "txt", "xlsx"], accept_multiple_files=True, key="statement_files")
+            if uploads:
+                upload_key = tuple(f.file_id for f in uploads)
+                if st.session_state.get('statement_import', (None,))[0] != upload_key:
+                    try:
+                        st.session_state['statement_import'] = (upload_key, *statements.import_statements(uploads))
+                    except Exception as e:
+                        st.session_state['statement_import'] = (upload_key, None, None)
+                        st.error(f"Couldn't read these files: {e}")
+                _, updates, holdings = st.session_state['statement_import']
+                if updates:
+                    st.dataframe(holdings.round(0), width="stretch", hide_index=True)
+                    st.caption("Values come from the statements' market values where given, otherwise units at the last traded price. A SIP is a purchase repeated for at least 3 months in a row that is still running.")
+                    st.button("✅ Use these values", type="primary", on_click=apply_import, args=(updates,))
+                elif updates is not None:
+                    st.warning("No holdings found. The files need a header row with a name/ISIN column and an amount, units or value column.")
+        
         c1, c2, c3 = st.columns(3)
         c1.number_input("Total Corpus in EPFO / 401k / Pensions", min_value=0, value=int(st.session_state.db.get("epf", 0)), key="epf", on_change=sync, args=("epf",))
         c1.caption(f"**{fmt_curr(st.session_state.db.get('epf', 0), sym, is_inr)}**")
@@ -328,6 +380,41 @@ elif 1 <= st.session_state.step <= 4:
         c6.number_input("House Cost in Today's Value", min_value=0, value=int(st.session_state.db.get("house_cost", 0)), key="house_cost", on_change=sync, args=("house_cost",))
         c6.caption(f"**{fmt_curr(st.session_state.db.get('house_cost', 0), sym, is_inr)}**")
         
+        if st.session_state.db.get("housing_idx", 0) == 1:
+            st.markdown("**Home Purchase Plan** *(purchase age 0 = buy at retirement)*")
+            h1, h2, h3, h4 = st.columns(4)
+            h1.number_input("Buy at Age", min_value=0, max_value=100, value=int(st.session_state.db.get("house_age", 0)), key="house_age", on_change=sync, args=("house_age",))
+            h2.slider("Down Payment %", min_value=0, max_value=100, value=int(st.session_state.db.get("house_down_pct", 100)), key="house_down_pct", on_change=sync, args=("house_down_pct",))
+            h3.number_input("Home Loan Rate %", min_value=0.0, max_value=25.0, value=float(st.session_state.db.get("house_loan_rate", 8.5)), key="house_loan_rate", on_change=sync, args=("house_loan_rate",))
+            h4.number_input("Home Loan Tenure (Years)", min_value=1, max_value=30, value=int(st.session_state.db.get("house_loan_tenure", 20)), key="house_loan_tenure", on_change=sync, args=("house_loan_tenure",))
+            st.caption("Until you buy, your rent counts as an expense. Once you own, the old rent budget pays the home-loan EMI; anything left over is invested and any shortfall comes out of your savings.")
+        
+        st.markdown("**🎯 Life Goals** *(education, a wedding, a car… in today's value)*")
+        goal_sources = {"Usual Order": None, "Cash": "cash", "FD": "fd", "Fixed Income": "fixed_income", "Arbitrage": "arbitrage",
+                        "Gold": "gold", "SIP Corpus": "sip_corpus", "Equity": "equity", "EPF": "epf"}
+        goal_labels = {v: k for k, v in goal_sources.items()}
+        if 'goals_base' not in st.session_state:
+            st.session_state['goals_base'] = pd.DataFrame([{
+                "Goal": g.get("name", ""), "Age": g["age"], "Amount": g["amount"], "Years": g.get("years", 1),
+                "Inflation %": g.get("inflation"), "Paid From": goal_labels.get(g.get("bucket"), "Usual Order")
+            } for g in st.session_state.db.get("goals", [])], columns=["Goal", "Age", "Amount", "Years", "Inflation %", "Paid From"])
+        goals_df = st.data_editor(
+            st.session_state['goals_base'], num_rows="dynamic", hide_index=True, width="stretch", key="goals_editor",
+            column_config={
+                "Age": st.column_config.NumberColumn(min_value=int(st.session_state.db.get("age", 30)), max_value=100, step=1),
+                "Amount": st.column_config.NumberColumn(min_value=0, step=10000),
+                "Years": st.column_config.NumberColumn(min_value=1, max_value=40, step=1, help="Repeat every year for this many years"),
+                "Inflation %": st.column_config.NumberColumn(min_value=0.0, max_value=25.0, help="Leave blank to follow general inflation"),
+                "Paid From": st.column_config.SelectboxColumn(options=list(goal_sources)),
+            }
+        ).dropna(subset=["Age", "Amount"])
+        st.session_state.db["goals"] = [{
+            "name": "" if pd.isna(r["Goal"]) else str(r["Goal"]), "age": int(r["Age"]), "amount": float(r["Amount"]),
+            "years": 1 if pd.isna(r["Years"]) else int(r["Years"]), "inflation": None if pd.isna(r["Inflation %"]) else float(r["Inflation %"]),
+            "bucket": goal_sources.get(r["Paid From"]) if isinstance(r["Paid From"], str) else None,
+        } for _, r in goals_df.iterrows()]
+        st.caption("*Paid From* earmarks a bucket for the goal; if it runs short, the rest is withdrawn in the usual order (cash, FDs, … EPF last). Goals before retirement come out of your savings.")
+        
         with st.expander("⚙️ Advanced: Expected Annual Return Rates (%)", expanded=False):
             rc1, rc2, rc3 = st.columns(3)
             rc1.number_input("Mutual Fund Return", value=float(st.session_state.db.get("rate_sip", 12.0)), key="rate_sip", on_change=sync, args=("rate_sip",))
@@ -381,6 +468,7 @@ elif st.session_state.step == 5:
     c_back, _, _ = st.columns([1, 3, 3])
     if c_back.button("⬅️ Edit Inputs", width="stretch"):
         st.session_state.step = 4
+        st.query_params.clear()
         st.rerun()
     
     # 🔒 Extract all values directly from our protected vault
@@ -388,7 +476,7 @@ elif st.session_state.step == 5:
     safe_retire_age = max(age, st.session_state.db.get("retire_age", 60))
     living_expense = st.session_state.db.get("living_expense", 0)
     rent = st.session_state.db.get("rent", 0)
-    tax_slab = [0.0, 0.05, 0.10, 0.15, 0.20, 0.25, 0.30, 0.35, 0.40][st.session_state.db.get("tax_slab_idx", 6)]
+    tax_slab = calculator.TAX_SLAB_OPTIONS[st.session_state.db.get("tax_slab_idx", 6)]
     use_post_tax = st.session_state.db.get("use_post_tax", True)
     inflation = st.session_state.db.get("inflation", 6.0) / 100.0
     rent_inflation = st.session_state.db.get("rent_inflation", 8.0) / 100.0
@@ -420,34 +508,22 @@ elif st.session_state.step == 5:
     rate_arbitrage = st.session_state.db.get("rate_arbitrage", 7.5) / 100.0
     rate_fixed = st.session_state.db.get("rate_fixed", 7.5) / 100.0
 
-    eff_sip = taxes.calculate_post_tax_rate(rate_sip, "Equity", tax_slab, use_post_tax)
-    eff_eq = taxes.calculate_post_tax_rate(rate_equity, "Equity", tax_slab, use_post_tax)
-    eff_epf = taxes.calculate_post_tax_rate(rate_epf, "EPF", tax_slab, use_post_tax)
-    eff_gold = taxes.calculate_post_tax_rate(rate_gold, "Gold", tax_slab, use_post_tax)
-    eff_arb = taxes.calculate_post_tax_rate(rate_arbitrage, "Arbitrage", tax_slab, use_post_tax)
-    eff_bond = taxes.calculate_post_tax_rate(rate_fixed, "Debt", tax_slab, use_post_tax)
-
     # --- BASE ENGINE: Calculates the immutable truth ---
-    base_calc_in = {
-        "age": age, "retire_age": safe_retire_age, "living_expense": living_expense, "rent": rent, "current_sip": current_sip,
-        "monthly_pf": monthly_pf_inflow, "step_up": step_up, "inflation": inflation, "rent_inflation": rent_inflation,
-        "house_cost": house_cost, "housing_goal": housing_goal, "cash": cash, "fd": fd, "epf": epf,
-        "mutual_funds": mutual_funds, "stocks": stocks, "gold": gold, "arbitrage": arbitrage, "fixed_income": fixed_income,
-        "rate_savings": 0.03, "rate_epf": eff_epf, "rate_equity": eff_eq, "rate_gold": eff_gold, "rate_arbitrage": eff_arb, 
-        "rate_fd_gross": rate_fd_gross, "rate_new_sip": eff_sip, "rate_fixed": eff_bond, 
-        "retire_mode": "off"
-    }
-
-    base_df = calculator.generate_forecast(base_calc_in)
-    practical_age = int(calculator.calculate_true_fi_age(base_calc_in))
-    target_row = base_df[base_df['Age'] == safe_retire_age].iloc[0] if safe_retire_age in base_df['Age'].values else base_df.iloc[-1]
-    gap_val = float(target_row['Gap'])
-    
-    raw_extra_sip = float(calculator.solve_extra_sip_needed(base_calc_in))
-    extra_sip_req = math.ceil(raw_extra_sip)
-    
-    if gap_val < -10 and extra_sip_req == 0:
-        extra_sip_req = 1
+    # A shared link answers straight from the store by its token; otherwise compute and index the token
+    plan_token = share.encode_plan(st.session_state.db, st.session_state['curr_choice'])
+    results = result_store.get_shared(plan_token)
+    if results is None:
+        results = result_store.get_or_compute(st.session_state.db)
+        result_store.remember_token(plan_token, st.session_state.db)
+    st.session_state['plan_token'] = plan_token
+    st.query_params["plan"] = plan_token
+    base_calc_in = results["calc_in"]
+    base_key = results_store.input_key(base_calc_in)
+    base_df = results["base_df"]
+    target_row = results["target_row"]
+    gap_val = results["gap_val"]
+    practical_age = results["practical_age"]
+    extra_sip_req = results["extra_sip_req"]
 
     # --- 1. TOP DIAGNOSTICS (Line-Wise Report) ---
     st.header("Your Financial Reality 🔮")
@@ -523,6 +599,7 @@ elif st.session_state.step == 5:
         trap_banner_placeholder = st.empty()
         
         retire_mode = "off"
+        rebalance = "off"
         blend_toggled = False
         
         base_eq = (100 - safe_retire_age) / 100.0  
@@ -534,11 +611,15 @@ elif st.session_state.step == 5:
         if fd_trap_toggled:
             blend_toggled = qc2.toggle("✨ **Optimize My Retirement Portfolio (The Magic Fix)**", value=False)
             retire_mode = "dynamic" if blend_toggled else "100_fd"
+            if blend_toggled:
+                rebalance_labels = {"off": "Let the split drift", "annual": "Rebalance every year", "band": f"Rebalance when equity drifts over {calculator.REBALANCE_BAND * 100:.0f}%"}
+                rebalance = qc2.selectbox("⚖️ After retirement", list(rebalance_labels), format_func=rebalance_labels.get, help="Withdrawals come out of FDs first, so without rebalancing the portfolio slowly turns equity-heavy.")
 
         if fd_trap_toggled and not blend_toggled:
             target_corpus = target_row['Required Target']
             fd_gross_int = target_corpus * rate_fd_gross
-            tax_amt = taxes.calculate_india_tax(fd_gross_int)
+            regime, tax_deductions = calculator.tax_regime(base_calc_in)
+            tax_amt = taxes.interest_tax(fd_gross_int, regime, safe_retire_age, tax_deductions)
             net_int = fd_gross_int - tax_amt
             net_pct = (net_int / target_corpus) * 100 if target_corpus > 0 else 0
             
@@ -565,6 +646,7 @@ elif st.session_state.step == 5:
     plot_calc_in['retire_mode'] = retire_mode
     if retire_mode == 'dynamic':
         plot_calc_in['equity_alloc'] = optimal_eq
+        plot_calc_in['rebalance'] = rebalance
     
     with scenario_container:
         if extra_sip_req > 0:
@@ -609,31 +691,25 @@ elif st.session_state.step == 5:
 
         if zoom and practical_age < 100:
             end_v = int(min(max(practical_age, plot_calc_in['retire_age']) + 10, 100))
-            plot_df = df[df['Age'] <= end_v].copy()
+            plot_df = df[df['Age'] <= end_v]
         else:
-            plot_df = df.copy()
-
-        def tooltip_fmt(val, is_inr):
-            if is_inr:
-                if val >= 10000000: return f"₹ {val/10000000:.2f} Cr"
-                elif val >= 100000: return f"₹ {val/100000:.2f} L"
-                else: return f"₹ {val:,.0f}"
-            else:
-                if val >= 1000000: return f"{sym} {val/1000000:.2f} M"
-                elif val >= 1000: return f"{sym} {val/1000:.0f} k"
-                else: return f"{sym} {val:,.0f}"
-
-        plot_df['Wealth_Fmt'] = plot_df['Projected Wealth'].apply(lambda x: tooltip_fmt(x, is_inr))
-        plot_df['Target_Fmt'] = plot_df['Required Target'].apply(lambda x: tooltip_fmt(x, is_inr))
-        plot_df['Expense_Fmt'] = plot_df['Annual Expense'].apply(lambda x: tooltip_fmt(x, is_inr))
-        plot_df['Gap_Fmt'] = plot_df['Gap'].apply(lambda x: tooltip_fmt(x, is_inr))
+            plot_df = df
 
         if is_inr:
             chart_fmt = "datum.value >= 10000000 ? format(datum.value / 10000000, '.2f') + ' Cr' : datum.value >= 100000 ? format(datum.value / 100000, '.2f') + ' L' : format(datum.value, ',.0f')"
         else:
             chart_fmt = "datum.value >= 1000000 ? format(datum.value / 1000000, '.2f') + ' M' : datum.value >= 1000 ? format(datum.value / 1000, '.0f') + ' k' : format(datum.value, ',.0f')"
 
-        base_chart = alt.Chart(plot_df).encode(
+        # Tooltip labels are formatted client-side by Vega, so the frame is handed over as-is
+        def tooltip_expr(field):
+            return f"'{sym} ' + (" + chart_fmt.replace("datum.value", f"datum['{field}']") + ")"
+
+        base_chart = alt.Chart(plot_df).transform_calculate(
+            Wealth_Fmt=tooltip_expr('Projected Wealth'),
+            Target_Fmt=tooltip_expr('Required Target'),
+            Expense_Fmt=tooltip_expr('Annual Expense'),
+            Gap_Fmt=tooltip_expr('Gap')
+        ).encode(
             x=alt.X('Age:Q', axis=alt.Axis(format='d', labelOverlap=True, tickCount=5))
         )
         
@@ -670,25 +746,234 @@ elif st.session_state.step == 5:
         
         st.altair_chart(alt.layer(*layers, pt, rl), use_container_width=True)
 
-    # --- 7. AUDIT THE MATH ---
-    with st.expander("🔍 Audit the Math: Year-by-Year Raw Data", expanded=False):
-        display_df = base_df.copy() 
-        def format_currency_table(val):
-            if is_inr:
-                if val >= 10000000: return f"₹ {val/10000000:.2f} Cr"
-                elif val >= 100000: return f"₹ {val/100000:.2f} L"
-                else: return f"₹ {val:,.0f}"
+    # --- 7. SUSTAINABLE SPEND (max monthly spend for every retirement age, one batched solve) ---
+    with st.expander("💸 How Much Could You Safely Spend?", expanded=False):
+        spend_curve = results["max_spend"]
+        at_goal = spend_curve[spend_curve['Retire Age'] == safe_retire_age]
+        if len(at_goal):
+            at_goal = at_goal.iloc[0]
+            ms1, ms2, ms3 = st.columns(3)
+            ms1.metric(f"Max Monthly Spend (Retire at {safe_retire_age})", fmt_curr(at_goal['Max Monthly Spend'], sym, is_inr), delta=fmt_curr(at_goal['Max Monthly Spend'] - living_expense, sym, is_inr))
+            ms2.metric("Your Current Spend", fmt_curr(living_expense, sym, is_inr))
+            ms3.metric("Implied Withdrawal Rate", f"{at_goal['Withdrawal Rate'] * 100:.2f}%")
+        st.caption("Highest living expense in today's money (on top of rent and your house plan) that still lasts to 100, for every retirement age. The withdrawal rate is the first retirement year's spend divided by your wealth at retirement.")
+        
+        spend_chart = alt.Chart(spend_curve).transform_calculate(
+            Spend_Fmt=tooltip_expr('Max Monthly Spend'),
+            Rate_Fmt="format(datum['Withdrawal Rate'] * 100, '.2f') + '%'"
+        ).mark_line(color='#00BFFF', strokeWidth=3).encode(
+            x=alt.X('Retire Age:Q', axis=alt.Axis(format='d')),
+            y=alt.Y('Max Monthly Spend:Q', axis=alt.Axis(labelExpr=chart_fmt, title=f"Monthly Spend ({sym})")),
+            tooltip=[alt.Tooltip('Retire Age:Q'), alt.Tooltip('Spend_Fmt:N', title='Max Spend / mo'), alt.Tooltip('Rate_Fmt:N', title='Withdrawal Rate')]
+        )
+        current_rule = alt.Chart(pd.DataFrame({"y": [living_expense]})).mark_rule(color='#FFA500', strokeDash=[5, 5]).encode(y='y:Q')
+        st.altair_chart(alt.layer(spend_chart, current_rule), use_container_width=True)
+
+    # --- 8. HOUSE TIMING (every purchase age in one batched pass) ---
+    house_cands, house_best = results["house_timing"]
+    if house_best is not None:
+        with st.expander("🏠 When Should You Buy Your Home?", expanded=False):
+            planned_age = calculator.house_buy_age(base_calc_in, base_calc_in['retire_age'])
+            hb1, hb2, hb3 = st.columns(3)
+            hb1.metric("Best Age to Buy", f"{house_best['house_age']}", delta=f"{house_best['house_age'] - planned_age:+d} yrs vs your plan", delta_color="off")
+            hb2.metric("House Price Then", fmt_curr(house_cands.loc[house_cands['Buy at Age'] == house_best['house_age'], 'House Price'].iloc[0], sym, is_inr))
+            hb3.metric("Extra SIP Needed", fmt_curr(house_best['extra_sip'], sym, is_inr))
+            st.caption("Surplus at 100 (wealth left above the safety target, after every unpaid bill) if you buy at each age, keeping your down payment and loan terms. The best age needs the least extra SIP, and then leaves the most behind.")
+            house_chart = alt.Chart(house_cands).transform_calculate(
+                Surplus_Fmt=tooltip_expr('Surplus at 100'), Price_Fmt=tooltip_expr('House Price')
+            ).mark_bar().encode(
+                x=alt.X('Buy at Age:O', title="Buy at Age"),
+                y=alt.Y('Surplus at 100:Q', axis=alt.Axis(labelExpr=chart_fmt, title=f"Surplus at 100 ({sym})")),
+                color=alt.condition(alt.datum['Lasts to 100'], alt.value('#2E8B57'), alt.value('#FF4B4B')),
+                tooltip=[alt.Tooltip('Buy at Age:O'), alt.Tooltip('Price_Fmt:N', title='House Price'), alt.Tooltip('Surplus_Fmt:N', title='Surplus at 100')]
+            )
+            st.altair_chart(house_chart, use_container_width=True)
+
+    # --- 9. OLD OR NEW TAX REGIME (the whole lifetime under each regime, in one batched pass) ---
+    if is_inr:
+        regime_table, regime_best = results["tax_regimes"]
+        own_regime = calculator.tax_regime(base_calc_in)[0]
+        with st.expander("⚖️ Old or New Tax Regime?", expanded=False):
+            pick = regime_best["earlier_fi"] or regime_best["lower_sip"]
+            if pick is None:
+                st.success("✅ **Either regime works.** Both get you to financial independence at the same age with the same extra SIP.")
+            elif pick == own_regime:
+                st.success(f"✅ **Stay on the {pick.title()} Regime.** Switching would not get you there any sooner or any cheaper.")
             else:
-                if val >= 1000000: return f"{sym} {val/1000000:.2f} M"
-                else: return f"{sym} {val:,.0f}"
+                st.info(f"💡 **The {pick.title()} Regime gets you there sooner or cheaper.** Compare the two below before you next choose at filing time.")
+            for col, (_, row) in zip(st.columns(len(regime_table)), regime_table.iterrows()):
+                mine = " (yours)" if row['Regime'].lower() == own_regime else ""
+                col.metric(f"{row['Regime']} Regime{mine}", f"FI at {int(row['FI Age'])}", delta=f"{'+' if row['Take-home Change'] > 0 else ''}{fmt_curr(row['Take-home Change'], sym, is_inr)} take-home / mo", delta_color="normal" if row['Take-home Change'] else "off")
+                col.caption(f"Extra SIP needed: **{fmt_curr(row['Extra SIP Needed'], sym, is_inr)}** / mo")
+            st.caption("Your salary is taxed under each regime (Old: standard deduction plus your deductions; New: standard deduction only), and any change in take-home pay goes into your SIP. After retirement, FD interest is taxed under the same regime for the rest of your life.")
 
-        display_df['Projected Wealth (Green)'] = display_df['Projected Wealth'].apply(format_currency_table)
-        display_df['Required Money (Red)'] = display_df['Required Target'].apply(format_currency_table)
-        display_df['Annual Expense (Orange)'] = display_df['Annual Expense'].apply(format_currency_table)
-        display_df['Surplus / Gap'] = display_df['Gap'].apply(format_currency_table)
-        st.dataframe(display_df[['Age', 'Projected Wealth (Green)', 'Required Money (Red)', 'Annual Expense (Orange)', 'Surplus / Gap']], width="stretch", hide_index=True)
+    # --- 10. PREPAY OR INVEST (every prepayment amount and year in one batched run) ---
+    prepay_cands, prepay_best = results["prepayment"]
+    if len(prepay_cands):
+        with st.expander("🏦 Prepay Your Loan or Keep Investing?", expanded=False):
+            if prepay_best is None:
+                st.success("✅ **Keep investing.** No lump-sum prepayment beats leaving your money invested and letting the loan run its course.")
+            else:
+                st.info(f"💡 **Prepay {fmt_curr(prepay_best['Prepaid'], sym, is_inr)} at age {int(prepay_best['Prepay Age'])}.** Once the loan is gone, your EMI keeps flowing into SIPs, and you retire with **{fmt_curr(prepay_best['Gain vs Investing'], sym, is_inr)}** more net worth than if you kept the money invested.")
+            st.caption("Net worth gain at retirement (wealth minus any loan still outstanding) for each prepayment, compared with not prepaying. Prepayments come out of cash, FDs and other liquid assets first; EPF is never touched.")
+            heat_df = prepay_cands.dropna(subset=["Prepay Age"])
+            st.altair_chart(alt.Chart(heat_df).transform_calculate(Gain_Fmt=tooltip_expr('Gain vs Investing')).mark_rect().encode(
+                x=alt.X('Prepay Age:O', title="Prepay at Age"),
+                y=alt.Y('Share of Loan:O', axis=alt.Axis(format='%'), sort='descending', title="Lump Sum (share of principal)"),
+                color=alt.Color('Gain vs Investing:Q', scale=alt.Scale(scheme='redyellowgreen', domainMid=0), legend=None),
+                tooltip=[alt.Tooltip('Prepay Age:O', title='Age'), alt.Tooltip('Share of Loan:O', format='.0%', title='Share'), alt.Tooltip('Gain_Fmt:N', title='Gain vs Investing')]
+            ), use_container_width=True)
 
-    # --- 8. FEEDBACK BOX ---
+    # --- 11. MARKET RANDOMNESS (Monte Carlo + allocation sweep, streamed chunk by chunk) ---
+    with st.expander("🎲 Stress-Test Against Market Randomness", expanded=False):
+        st.markdown("Real returns and inflation swing from year to year, and together. This replays your plan across thousands of correlated market paths, including fat-tailed crashes and stretches of high inflation.")
+        mc_paths = 20000
+        mc_results = st.session_state.setdefault('mc_results', {})
+        
+        # No cancel flag: a widget change reruns the script, and Streamlit stops this run at its
+        # next st.* call between chunks. An interrupted run never reaches the store below.
+        if st.session_state.get('mc_base') != base_key:
+            st.session_state['mc_base'] = base_key
+            mc_results.clear()
+        
+        run_mc = st.button("▶️ Run the Stress Test", width="stretch", disabled=base_key in mc_results)
+        mc_progress = st.empty()
+        mc1, mc2 = st.columns(2)
+        mc_metric, mc_chart = mc1.empty(), mc1.empty()
+        sweep_caption, sweep_chart = mc2.empty(), mc2.empty()
+        
+        def draw_mc(trail):
+            last = trail[-1]
+            mc_metric.metric(f"Chance Your Money Lasts to 100 (Retire at {safe_retire_age})", f"{last['probability'] * 100:.1f}%", help=f"± {last['stderr'] * 196:.1f}% after {last['paths']:,} market paths")
+            conv = pd.DataFrame(trail).assign(lo=lambda d: d['probability'] - 1.96 * d['stderr'], hi=lambda d: d['probability'] + 1.96 * d['stderr'])
+            band = alt.Chart(conv).mark_area(opacity=0.25, color='#00BFFF').encode(x=alt.X('paths:Q', title="Paths simulated"), y=alt.Y('lo:Q', axis=alt.Axis(format='%'), title="Success probability"), y2='hi:Q')
+            mc_chart.altair_chart(band + alt.Chart(conv).mark_line(color='#00BFFF').encode(x='paths:Q', y='probability:Q'), use_container_width=True)
+        
+        def draw_sweep(sweep):
+            sweep_caption.markdown("**Extra SIP needed by retirement equity share** (dynamic blend, average returns)")
+            sweep_df = pd.DataFrame(sweep, columns=["Equity %", "Extra SIP"]).assign(**{"Equity %": lambda d: (d["Equity %"] * 100).round().astype(int)})
+            sweep_chart.altair_chart(alt.Chart(sweep_df).mark_bar(color='#00FF00').encode(
+                x=alt.X('Equity %:O'), y=alt.Y('Extra SIP:Q', axis=alt.Axis(labelExpr=chart_fmt, title=f"Extra SIP / mo ({sym})"))
+            ), use_container_width=True)
+        
+        if run_mc and base_key not in mc_results:
+            trail, sweep = [], []
+            model = returns_model.ReturnModel(dist="t", regimes=returns_model.STRESS_REGIMES)
+            for snap in batch.iter_success_probability(base_calc_in, model, n_paths=mc_paths, chunk=2000, seed=0):
+                trail.append(snap)
+                mc_progress.progress(snap['paths'] / mc_paths * 0.8, text=f"Simulating market paths… {snap['paths']:,} / {mc_paths:,}")
+                draw_mc(trail)
+            for eq_pct, req_sip in calculator.iter_allocation_sweep(base_calc_in):
+                sweep.append((eq_pct, req_sip))
+                mc_progress.progress(0.8 + 0.2 * len(sweep) / len(calculator.ALLOCATION_SWEEP), text=f"Testing portfolio blends… {int(eq_pct * 100)}% equity")
+                draw_sweep(sweep)
+            mc_results[base_key] = {"trail": trail, "sweep": sweep}
+            mc_progress.empty()
+        
+        if base_key in mc_results:
+            draw_mc(mc_results[base_key]["trail"])
+            draw_sweep(mc_results[base_key]["sweep"])
+
+    # --- 12. WHAT-IF SCENARIOS (evaluated together in one batched engine call) ---
+    with st.expander("🧪 Compare What-If Scenarios Side by Side", expanded=False):
+        mode_labels = {"off": "Keep as is", "100_fd": "100% Risk-Free", "dynamic": "Dynamic Blend", "glide": "Glide Path"}
+        glide = results["glide_path"]
+        mode_keys = {v: k for k, v in mode_labels.items()}
+        
+        if st.session_state.get('scenario_base') != base_key:
+            st.session_state['scenario_base'] = base_key
+            st.session_state['scenario_defaults'] = pd.DataFrame([
+                {"Scenario": "My Plan", "Retire Age": safe_retire_age, "Monthly SIP": int(current_sip), "Step-Up %": int(step_up * 100), "Housing Plan": housing_goal, "At Retirement": mode_labels["off"], "Equity %": 40, "Start Equity %": None, "Glide Years": None},
+                {"Scenario": "Retire 5 Years Later", "Retire Age": min(99, safe_retire_age + 5), "Monthly SIP": int(current_sip), "Step-Up %": int(step_up * 100), "Housing Plan": housing_goal, "At Retirement": mode_labels["off"], "Equity %": 40, "Start Equity %": None, "Glide Years": None},
+                {"Scenario": "Extra SIP + Blend", "Retire Age": safe_retire_age, "Monthly SIP": int(current_sip + extra_sip_req), "Step-Up %": int(step_up * 100), "Housing Plan": housing_goal, "At Retirement": mode_labels["dynamic"], "Equity %": int(optimal_eq * 100), "Start Equity %": None, "Glide Years": None},
+                {"Scenario": "Best Glide Path", "Retire Age": safe_retire_age, "Monthly SIP": int(current_sip + math.ceil(glide["extra_sip"])), "Step-Up %": int(step_up * 100), "Housing Plan": housing_goal, "At Retirement": mode_labels["glide"], "Equity %": round(glide["glide_end_eq"] * 100), "Start Equity %": round(glide["glide_start_eq"] * 100), "Glide Years": glide["glide_years"]},
+            ])
+        
+        st.markdown("Add, remove or edit rows. Only new or changed scenarios are recomputed.")
+        st.caption(f"A **Glide Path** re-balances every year, sliding equity from *Start Equity %* down to *Equity %* over the *Glide Years* before retirement. The best path we found for you: **{round(glide['glide_start_eq'] * 100)}% → {round(glide['glide_end_eq'] * 100)}%** over **{glide['glide_years']} years**.")
+        scen_df = st.data_editor(
+            st.session_state['scenario_defaults'], num_rows="dynamic", hide_index=True, width="stretch", key=f"scenario_editor_{base_key[:12]}",
+            column_config={
+                "Retire Age": st.column_config.NumberColumn(min_value=age, max_value=99, step=1),
+                "Monthly SIP": st.column_config.NumberColumn(min_value=0, step=1000),
+                "Step-Up %": st.column_config.NumberColumn(min_value=0, max_value=50, step=1),
+                "Housing Plan": st.column_config.SelectboxColumn(options=h_options),
+                "At Retirement": st.column_config.SelectboxColumn(options=list(mode_labels.values())),
+                "Equity %": st.column_config.NumberColumn(min_value=0, max_value=100, step=5),
+                "Start Equity %": st.column_config.NumberColumn(min_value=0, max_value=100, step=5),
+                "Glide Years": st.column_config.NumberColumn(min_value=0, max_value=40, step=1),
+            }
+        ).dropna(subset=["Scenario", "Retire Age"])
+        
+        cell = lambda v, default: default if pd.isna(v) else v
+        scen_inputs = []
+        for _, r in scen_df.iterrows():
+            s_in = base_calc_in.copy()
+            s_in.update({
+                "retire_age": int(max(age, r["Retire Age"])), "current_sip": float(cell(r["Monthly SIP"], 0)),
+                "step_up": float(cell(r["Step-Up %"], 0)) / 100.0, "housing_goal": cell(r["Housing Plan"], housing_goal),
+                "retire_mode": mode_keys.get(cell(r["At Retirement"], ""), "off"), "equity_alloc": float(cell(r["Equity %"], 40)) / 100.0
+            })
+            if s_in["retire_mode"] == "glide":
+                s_in.update({
+                    "glide_start_eq": float(cell(r["Start Equity %"], 80)) / 100.0, "glide_end_eq": s_in["equity_alloc"],
+                    "glide_years": int(cell(r["Glide Years"], 10))
+                })
+            scen_inputs.append((str(r["Scenario"]), results_store.input_key(s_in), s_in))
+        
+        # Per-scenario cache: only unseen inputs go into the batch
+        scen_cache = st.session_state.setdefault('scenario_cache', {})
+        missing = [(k, s_in) for _, k, s_in in scen_inputs if k not in scen_cache]
+        if missing:
+            for (k, _), res in zip(missing, batch.evaluate_scenarios([s_in for _, s_in in missing])):
+                scen_cache[k] = res
+        live_keys = {k for _, k, _ in scen_inputs}
+        for k in [k for k in scen_cache if k not in live_keys]:
+            del scen_cache[k]
+        
+        if scen_inputs:
+            overlay = pd.concat([scen_cache[k]["forecast"][["Age", "Projected Wealth"]].assign(Scenario=name) for name, k, _ in scen_inputs], ignore_index=True)
+            st.altair_chart(
+                alt.Chart(overlay).mark_line(strokeWidth=2).encode(
+                    x=alt.X('Age:Q', axis=alt.Axis(format='d')),
+                    y=alt.Y('Projected Wealth:Q', axis=alt.Axis(labelExpr=chart_fmt, title=f"Amount ({sym})")),
+                    color=alt.Color('Scenario:N', legend=alt.Legend(orient="bottom")),
+                    tooltip=['Scenario:N', 'Age:Q']
+                ),
+                use_container_width=True
+            )
+            st.dataframe(pd.DataFrame([{
+                "Scenario": name,
+                "Retire Age": s_in["retire_age"],
+                "Wealth at Retirement": fmt_curr(scen_cache[k]["wealth_at_retire"], sym, is_inr),
+                "Surplus / Gap": fmt_curr(scen_cache[k]["gap_val"], sym, is_inr),
+                "Extra SIP Needed / mo": fmt_curr(math.ceil(scen_cache[k]["extra_sip"]), sym, is_inr),
+                "Lasts to 100": "✅" if scen_cache[k]["survives"] else "❌",
+            } for name, k, s_in in scen_inputs]), hide_index=True, width="stretch")
+
+    # --- 13. AUDIT THE MATH ---
+    with st.expander("🔍 Audit the Math: Year-by-Year Raw Data", expanded=False):
+        forecast_tbl = export.forecast_table(base_df, metadata={"engine_version": calculator.ENGINE_VERSION, "tax_version": taxes.TAX_VERSION})
+        money_col = lambda label: st.column_config.NumberColumn(f"{label} ({sym})", format="localized")
+        st.dataframe(
+            forecast_tbl.select(['Age', 'Projected Wealth', 'Required Target', 'Annual Expense', 'Gap']),
+            column_config={
+                "Projected Wealth": money_col("Projected Wealth (Green)"),
+                "Required Target": money_col("Required Money (Red)"),
+                "Annual Expense": money_col("Annual Expense (Orange)"),
+                "Gap": money_col("Surplus / Gap"),
+            },
+            width="stretch", hide_index=True
+        )
+        
+        st.caption("Download the full year-by-year forecast, including every asset bucket:")
+        d1, d2 = st.columns(2)
+        d1.download_button("⬇️ Parquet", data=export.to_parquet_bytes(forecast_tbl), file_name="forecast.parquet", mime="application/vnd.apache.parquet", width="stretch")
+        d2.download_button("⬇️ CSV", data=export.to_csv_bytes(forecast_tbl), file_name="forecast.csv", mime="text/csv", width="stretch")
+
+    st.caption("🔗 This page's address now holds your whole plan. Copy it from the address bar to share it; whoever opens it sees these exact results.")
+
+    # --- 14. FEEDBACK BOX ---
     st.divider()
     st.subheader("💬 We value your feedback!")
     st.session_state.db["feedback_input"] = st.text_area("Tell us how we can improve your experience, or what features you'd like to see next:", value=st.session_state.db.get("feedback_input", ""), key="feedback_input", on_change=sync, args=("feedback_input",))
@@ -739,6 +1024,16 @@ elif st.session_state.step == 5:
                 "rate_gold": float(st.session_state.db.get("rate_gold", 8.0)), 
                 "rate_arbitrage": float(st.session_state.db.get("rate_arbitrage", 7.5)), 
                 "rate_fixed": float(st.session_state.db.get("rate_fixed", 7.5)), 
+                "loan_principal": float(st.session_state.db.get("loan_principal", 0)),
+                "loan_rate": float(st.session_state.db.get("loan_rate", 9.0)),
+                "loan_tenure": float(st.session_state.db.get("loan_tenure", 0)),
+                "house_age": int(st.session_state.db.get("house_age") or 0),
+                "house_down_pct": float(st.session_state.db.get("house_down_pct", 100)),
+                "house_loan_rate": float(st.session_state.db.get("house_loan_rate", 8.5)),
+                "house_loan_tenure": float(st.session_state.db.get("house_loan_tenure", 20)),
+                "goals": st.session_state.db.get("goals", []),
+                "tax_regime": st.session_state.db.get("tax_regime", "new"),
+                "tax_deductions": float(st.session_state.db.get("tax_deductions", 0)),
                 "total_liquidity": (cash + fd + st.session_state.db.get("credit_limit", 0)), 
                 "net_worth": (cash + fd + epf + mutual_funds + stocks + gold + arbitrage + fixed_income),
                 "feedback": st.session_state.db.get("feedback_input", ""),
@@ -749,4 +1044,13 @@ elif st.session_state.step == 5:
             }
             supabase.table("user_data").upsert(payload).execute()
         except Exception as e: 
-            pass
\ No newline at end of file
+            pass
+
+    # ==========================================
+    # 🔮 SPECULATE ON THE NEXT EDIT
+    # ==========================================
+    # While the user reads, precompute the vaults one typical tweak away (retire age ±1,
+    # SIP ±5k, returns ±1%) so going back to edit one of them answers from the store.
+    if 'speculation' not in st.session_state:
+        st.session_state['speculation'] = results_store.Speculation(result_store)
+    st.session_state['speculation'].start(st.session_state.db)
@@ -0,0 +1,726 @@
+"""
+🧮 BATCHED SIMULATION KERNEL
+Vectorized (numpy) version of calculator.simulate_survival / generate_forecast that
+runs many profiles or scenarios in one pass: each year is a handful of array ops over
+all rows instead of a Python loop per row. Arithmetic mirrors the scalar engine line
+by line, so a single row reproduces the scalar results.
+"""
+import math
+
+import numpy as np
+import pandas as pd
+
+import calculator
+import returns_model
+import taxes
+
+MODES = {"off": 0, "100_fd": 1, "dynamic": 2, "glide": 3}
+SIP_SEARCH_HIGH = 10000000.0
+SIP_SEARCH_ITERS = 60
+# Rates that may also be given per year as [n, T] arrays (stochastic paths)
+RATE_KEYS = ("r_cash", "r_eq", "r_sip", "r_epf", "r_gold", "r_arb", "gross_fd", "inflation", "rent_inflation")
+
+# ==========================================
+# 📥 INPUT STACKING
+# ==========================================
+def _house_terms(d):
+    """Home-loan constants from calculator.house_loan_state that don't depend on the principal."""
+    rate = d.get('house_loan_rate', calculator.HOUSE_DEFAULTS['house_loan_rate'])
+    months = int(round(d.get('house_loan_tenure', calculator.HOUSE_DEFAULTS['house_loan_tenure']) * 12))
+    i = rate / 12
+    growth = (1 + i) ** 12
+    annuity = 12.0 if i == 0 else (growth - 1) / i
+    denom = 0.0 if (i == 0 or months <= 0) else 1 - (1 + i) ** -months
+    return i, months, denom, growth, annuity
+
+def _stack_goals(datas):
+    """
+    Compiled goal schedules as [n, funding sources, years from now] arrays: the deterministic
+    outflows plus their own-rate / today's-money split (see calculator.compile_goals).
+    """
+    n, S = len(datas), len(calculator.GOAL_BUCKETS) + 1
+    W = int(101 - min(d['age'] for d in datas)) if any(d.get('goals') for d in datas) else 0
+    out = {k: np.zeros((n, S, W)) for k in ("goals", "goals_own", "goals_real")}
+    for i, d in enumerate(datas):
+        if not d.get('goals'):
+            continue
+        own, real = calculator.compile_goals(d, split=True)
+        for key, sched in (("goals", calculator.compile_goals(d)), ("goals_own", own), ("goals_real", real)):
+            for src, amounts in sched.items():
+                out[key][i, src, :len(amounts)] = amounts
+    return out
+
+def stack_inputs(datas):
+    """Turns a list of engine input dicts into a dict of per-row arrays (loans as [n, max loans])."""
+    col = lambda fn, dtype=float: np.array([fn(d) for d in datas], dtype=dtype)
+    states = [calculator.loan_state(d) for d in datas]
+    loans = np.zeros((len(datas), max([1] + [len(s) for s in states]), 4))
+    loans[:, :, 1] = 1.0
+    for i, s in enumerate(states):
+        if s:
+            loans[i, :len(s)] = s
+    house = np.array([_house_terms(d) for d in datas]).reshape(len(datas), 5)
+    return {
+        "n": len(datas),
+        "age": col(lambda d: d['age'], int),
+        "retire_age": col(lambda d: d['retire_age'], int),
+        "mode": col(lambda d: MODES.get(d.get('retire_mode', 'off'), 0), int),
+        "equity_alloc": col(lambda d: d.get('equity_alloc', 0.4)),
+        "rebalance": col(lambda d: calculator.REBALANCE_POLICIES.index(calculator.rebalance_policy(d)[0]), int),
+        "rebalance_band": col(lambda d: calculator.rebalance_policy(d)[1]),
+        **{k: col(lambda d, k=k: d.get(k, v)) for k, v in calculator.GLIDE_DEFAULTS.items()},
+        "cash": col(lambda d: d['cash']), "fd": col(lambda d: d['fd']), "epf": col(lambda d: d['epf']),
+        "equity": col(lambda d: d['mutual_funds'] + d['stocks']),
+        "gold": col(lambda d: d.get('gold', 0)), "arbitrage": col(lambda d: d.get('arbitrage', 0)),
+        "fixed_income": col(lambda d: d.get('fixed_income', 0)),
+        "r_cash": col(lambda d: d['rate_savings']), "r_eq": col(lambda d: d['rate_equity']),
+        "r_sip": col(lambda d: d.get('rate_new_sip', d['rate_equity'])), "r_epf": col(lambda d: d['rate_epf']),
+        "r_gold": col(lambda d: d.get('rate_gold', 0.08)), "r_arb": col(lambda d: d.get('rate_arbitrage', 0.07)),
+        "gross_fd": col(lambda d: d['rate_fd_gross']),
+        "monthly_pf": col(lambda d: d['monthly_pf']), "current_sip": col(lambda d: d['current_sip']),
+        "step_up": col(lambda d: d['step_up']),
+        "exp": col(lambda d: d['living_expense'] * 12), "rent": col(lambda d: d['rent'] * 12),
+        "inflation": col(lambda d: d['inflation']), "rent_inflation": col(lambda d: d['rent_inflation']),
+        "house_cost": col(lambda d: d['house_cost']),
+        "rent_forever": col(lambda d: d['housing_goal'] == "Rent Forever", bool),
+        "buy_home": col(lambda d: d['housing_goal'] == "Buy a Home", bool),
+        "house_age": col(lambda d: d.get('house_age') or -1, int), "house_down": col(lambda d: d.get('house_down', 1.0)),
+        "house_i": house[:, 0], "house_months": house[:, 1], "house_denom": house[:, 2],
+        "house_growth": house[:, 3], "house_annuity": house[:, 4],
+        "loan_bal": loans[:, :, 0], "loan_growth": loans[:, :, 1], "loan_annuity": loans[:, :, 2], "loan_emi": loans[:, :, 3],
+        "tax_old": col(lambda d: calculator.tax_regime(d)[0] == "old", bool), "tax_deductions": col(lambda d: calculator.tax_regime(d)[1]),
+        "prepay_amount": col(lambda d: d.get('prepay_amount', 0)),
+        "prepay_year": col(lambda d: d.get('prepay_year', -1), int), "prepay_loan": col(lambda d: d.get('prepay_loan', 0), int),
+        **_stack_goals(datas),
+    }
+
+def take_rows(p, idx):
+    """Row subset / repetition of stacked inputs (e.g. one row per candidate)."""
+    idx = np.asarray(idx)
+    out = {k: v[idx] for k, v in p.items() if k != "n"}
+    out["n"] = len(idx)
+    return out
+
+# ==========================================
+# ⚙️ KERNEL
+# ==========================================
+def glide_equity(p, cur_age, retire):
+    """calculator.glide_equity for every row."""
+    start, end, years = p["glide_start_eq"], p["glide_end_eq"], p["glide_years"]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        frac = np.minimum(1.0, np.maximum(0.0, (cur_age - (retire - years)) / years))
+    frac = np.where(years <= 0, (cur_age >= retire).astype(float), frac)
+    return start + (end - start) * frac
+
+def run(p, extra_sip=0.0, retire_age=None, record=False, slack=False):
+    """
+    Simulates every row from its current age to 100. Any of RATE_KEYS may be an [n, T]
+    array of per-year rates (column = years from now) instead of one rate per row.
+    Returns {"survived": bool[n]} and, with record=True, per-year [n, T] arrays of
+    start wealth, annual need, outflow and effective return (as generate_forecast uses).
+    With slack=True it also returns "slack" (wealth at 100 above the 1.1x terminal target,
+    minus every withdrawal the buckets could not pay), "retire_wealth", "retire_debt"
+    (loan balances at the start of the retirement year) and "prepaid".
+    """
+    n = p["n"]
+    age = p["age"]
+    retire = p["retire_age"] if retire_age is None else np.broadcast_to(np.asarray(retire_age, dtype=int), (n,))
+    T = int(100 - age.min() + 1)
+
+    cash, fd, epf, equity = p["cash"].copy(), p["fd"].copy(), p["epf"].copy(), p["equity"].copy()
+    gold, arbitrage, fixed_income = p["gold"].copy(), p["arbitrage"].copy(), p["fixed_income"].copy()
+    sip_corpus = np.zeros(n)
+    annual_sip = (p["current_sip"] + extra_sip) * 12
+    curr_exp, curr_rent = p["exp"].copy(), p["rent"].copy()
+    r_cash, r_eq, r_sip, r_epf, r_gold, r_arb, gross_fd, inflation, rent_inflation = (p[k] for k in RATE_KEYS)
+    step_up = p["step_up"]
+    pf_annual = p["monthly_pf"] * 12
+    yearly = {k for k in RATE_KEYS if np.ndim(p[k]) == 2}
+    price_index = np.ones(n)  # Cumulative inflation, only needed when it varies by year
+    loan_bal = p["loan_bal"].copy()
+    has_loans = bool((loan_bal > 0).any())
+    emi_budget = np.zeros(n)
+    for j in range(loan_bal.shape[1]):
+        emi_budget = emi_budget + p["loan_emi"][:, j]
+    prepaid = np.zeros(n)
+    buy_age = np.where(p["house_age"] >= 0, np.maximum(age, p["house_age"]), retire)
+    buys_home = bool(p["buy_home"].any())
+    house_bal, house_annuity, house_emi12 = np.zeros(n), np.zeros(n), np.zeros(n)
+    has_house_loan = False
+    has_goals = p["goals"].shape[2] > 0
+    tax_levels = taxes.interest_tax_levels(p["tax_old"], p["tax_deductions"])
+
+    alive = np.ones(n, dtype=bool)
+    terminal_ok = np.ones(n, dtype=bool)
+    if slack:
+        unpaid, slack_out, retire_wealth, retire_debt = np.zeros(n), np.zeros(n), np.zeros(n), np.zeros(n)
+    if record:
+        rec = {k: np.zeros((n, T)) for k in ("wealth", "need", "outflow", "ret")}
+
+    for yr in range(T):
+        cur_age = age + yr
+        active = cur_age <= 100
+        if yearly:
+            r_cash, r_eq, r_sip, r_epf, r_gold, r_arb, gross_fd, inflation, rent_inflation = (
+                p[k][:, yr] if k in yearly else p[k] for k in RATE_KEYS)
+        pays_rent = p["rent_forever"] | (p["buy_home"] & (cur_age < buy_age))
+        annual_need = curr_exp + np.where(pays_rent, curr_rent, 0.0)
+
+        # 🛡️ RETIREMENT PORTFOLIO SHIFT (glide rows re-balance every year, dynamic rows per their policy)
+        glide = active & (p["mode"] == 3)
+        shift = (active & (cur_age == retire) & (p["mode"] > 0)) | glide
+        rebal = active & (p["mode"] == 2) & (p["rebalance"] > 0) & (cur_age > retire)
+        if rebal.any():
+            total_wealth = cash + fd + epf + equity + gold + arbitrage + fixed_income + sip_corpus
+            with np.errstate(divide="ignore", invalid="ignore"):
+                drift = (total_wealth > 0) & (np.abs(equity / total_wealth - p["equity_alloc"]) > p["rebalance_band"])
+            shift |= rebal & ((p["rebalance"] == 1) | drift)
+        if shift.any():
+            total_wealth = cash + fd + epf + equity + gold + arbitrage + fixed_income + sip_corpus
+            eq_alloc = np.where(glide, glide_equity(p, cur_age, retire), p["equity_alloc"]) if glide.any() else p["equity_alloc"]
+            to_fd = shift & (p["mode"] == 1)
+            dyn = shift & (p["mode"] >= 2)
+            fd = np.where(to_fd, total_wealth, np.where(dyn, total_wealth * (1.0 - eq_alloc), fd))
+            equity = np.where(to_fd, 0.0, np.where(dyn, total_wealth * eq_alloc, equity))
+            cash, epf, gold, arbitrage, fixed_income, sip_corpus = (
+                np.where(shift, 0.0, b) for b in (cash, epf, gold, arbitrage, fixed_income, sip_corpus))
+
+        start_wealth = cash + fd + epf + equity + gold + arbitrage + fixed_income + sip_corpus
+        acc = active & (cur_age < retire)
+        dec = active & ~acc
+        acc_f = acc.astype(float)
+
+        # 🏦 LOANS: optional lump-sum prepayment (liquid buckets, EPF stays locked), then this year's EMIs
+        emi_paid = freed_emi = 0.0
+        if slack and (has_loans or has_house_loan):
+            retire_debt = np.where(active & (cur_age == retire), loan_bal.sum(axis=1) + house_bal, retire_debt)
+        if has_loans:
+            pre = active & (p["prepay_year"] == yr)
+            if pre.any():
+                rows = np.arange(n)
+                rem = want = np.where(pre, np.minimum(p["prepay_amount"], loan_bal[rows, p["prepay_loan"]]), 0.0)
+                buckets = [cash, fd, fixed_income, arbitrage, gold, sip_corpus, equity]
+                for i, b in enumerate(buckets):
+                    take = np.minimum(b, rem)
+                    buckets[i] = b - take
+                    rem = rem - take
+                cash, fd, fixed_income, arbitrage, gold, sip_corpus, equity = buckets
+                loan_bal[rows, p["prepay_loan"]] -= want - rem
+                prepaid = prepaid + (want - rem)
+            grown = loan_bal * p["loan_growth"]
+            rest = grown - p["loan_annuity"]
+            closing = rest <= 0
+            annuity = p["loan_annuity"]
+            pay = np.where(closing, np.where(annuity > 0, grown * p["loan_emi"] / np.where(annuity > 0, annuity, 1.0), grown), p["loan_emi"])
+            loan_bal = np.where(closing, 0.0, rest)
+            emi_paid = np.zeros(n)
+            for j in range(pay.shape[1]):
+                emi_paid = emi_paid + pay[:, j]
+            freed_emi = (emi_budget - emi_paid) * acc_f
+
+        # 🏠 HOUSE PURCHASE: down payment this year, the rest as a home loan starting now
+        house_out = house_emi = rent_saved = 0.0
+        if buys_home:
+            buy = active & p["buy_home"] & (cur_age == buy_age)
+            if buy.any():
+                growth = price_index if "inflation" in yearly else (1 + inflation) ** yr
+                price = p["house_cost"] * growth
+                house_out = np.where(buy, price * p["house_down"], 0.0)
+                new_loan = buy & (p["house_down"] < 1)
+                if new_loan.any():
+                    principal = price * (1 - p["house_down"])
+                    i, months, denom = p["house_i"], p["house_months"], p["house_denom"]
+                    with np.errstate(divide="ignore", invalid="ignore"):
+                        emi = np.where(i == 0, principal / np.maximum(months, 1), principal * i / np.where(denom != 0, denom, 1.0))
+                    emi = np.where((principal > 0) & (months > 0), emi, 0.0)
+                    house_bal = np.where(new_loan, principal, house_bal)
+                    house_annuity = np.where(new_loan, emi * p["house_annuity"], house_annuity)
+                    house_emi12 = np.where(new_loan, emi * 12, house_emi12)
+                    has_house_loan = True
+            if has_house_loan:
+                grown = house_bal * p["house_growth"]
+                rest = grown - house_annuity
+                closing = rest <= 0
+                house_emi = np.where(closing, np.where(house_annuity > 0, grown * house_emi12 / np.where(house_annuity > 0, house_annuity, 1.0), grown), house_emi12)
+                house_bal = np.where(closing, 0.0, rest)
+            # An owner still working services the home loan from the old rent budget
+            owner = acc & p["buy_home"] & (cur_age >= buy_age)
+            if owner.any():
+                house_out = np.where(owner, house_out + np.maximum(0.0, house_emi - curr_rent), house_out)
+                rent_saved = np.where(owner, np.maximum(0.0, curr_rent - house_emi), 0.0)
+
+        # 🎯 GOALS: earmarked buckets pay first, the rest joins this year's withdrawals
+        goal_out = goal_direct = 0.0
+        if has_goals and yr < p["goals"].shape[2]:
+            if "inflation" in yearly:
+                goal = p["goals_own"][:, :, yr] + p["goals_real"][:, :, yr] * price_index[:, None]
+            else:
+                goal = p["goals"][:, :, yr]
+            buckets = [cash, fd, fixed_income, arbitrage, gold, sip_corpus, equity, epf]
+            goal_out = goal_direct = np.zeros(n)
+            for i, b in enumerate(buckets):
+                take = np.minimum(b, goal[:, i])
+                buckets[i] = b - take
+                goal_direct = goal_direct + take
+                goal_out = goal_out + (goal[:, i] - take)
+            goal_out = goal_out + goal[:, -1]
+            cash, fd, fixed_income, arbitrage, gold, sip_corpus, equity, epf = buckets
+
+        # WITHDRAWALS: decumulation needs plus any house or goal money due while working
+        # (other accumulation rows carry a zero outflow through the waterfall)
+        outflow = np.where(dec, annual_need, 0.0)
+        if buys_home:
+            outflow = outflow + house_out
+            if has_house_loan:
+                outflow = np.where(dec, outflow + house_emi, outflow)
+        if has_loans:
+            outflow = np.where(dec, outflow + emi_paid, outflow)
+        if has_goals:
+            outflow = outflow + goal_out
+        if dec.any() or ((buys_home or has_goals) and np.any(outflow > 0)):
+            rem = outflow
+            buckets = [cash, fd, fixed_income, arbitrage, gold, sip_corpus, equity, epf]
+            for i, b in enumerate(buckets):
+                take = np.minimum(b, rem)
+                buckets[i] = b - take
+                rem = rem - take
+            cash, fd, fixed_income, arbitrage, gold, sip_corpus, equity, epf = buckets
+            alive &= ~(active & (rem > 0.01))
+            if slack:
+                unpaid = unpaid + rem
+
+        # GROWTH: identical for both phases except FD tax and the accumulation-only inflows.
+        # Adding `x * 0.0` keeps the scalar engine's exact arithmetic on the other phase.
+        fd_gross_interest = fd * gross_fd
+        fd_net_interest = fd_gross_interest - taxes.interest_tax_vec(fd_gross_interest, cur_age, tax_levels)
+        epf = epf + ((epf * r_epf) + pf_annual * acc_f)
+        sip_corpus = sip_corpus + ((sip_corpus * r_sip) + annual_sip * acc_f)
+        if has_loans:
+            sip_corpus = sip_corpus + freed_emi
+        if buys_home:
+            sip_corpus = sip_corpus + rent_saved
+        annual_sip = np.where(acc, annual_sip * (1 + step_up), annual_sip)
+        cash = cash + cash * r_cash
+        fd = np.where(acc, fd + fd * (gross_fd * 0.7), fd + fd_net_interest)
+        fixed_income = fixed_income + fixed_income * (gross_fd * 0.7)
+        arbitrage = arbitrage + arbitrage * r_arb
+        gold = gold + gold * r_gold
+        equity = equity + equity * r_eq
+
+        total_end = cash + fd + epf + equity + gold + arbitrage + fixed_income + sip_corpus
+        at_100 = active & (cur_age == 100)
+        terminal_ok &= ~at_100 | (total_end >= annual_need * 1.1)
+        if slack:
+            slack_out = np.where(at_100, total_end - annual_need * 1.1 - unpaid, slack_out)
+            retire_wealth = np.where(active & (cur_age == retire), start_wealth, retire_wealth)
+
+        if record:
+            rec["wealth"][:, yr] = start_wealth
+            rec["need"][:, yr] = annual_need
+            spent = outflow + goal_direct
+            rec["outflow"][:, yr] = spent
+            with np.errstate(divide="ignore", invalid="ignore"):
+                acc_ret = np.where(start_wealth > 0, ((total_end - annual_sip - pf_annual - freed_emi - rent_saved + np.where(acc, outflow, 0.0) + goal_direct) / start_wealth) - 1, r_eq)
+                invested = start_wealth - spent
+                fallback = np.where(fd > 0, fd_net_interest / np.where(fd > 0, fd, 1.0), r_eq)
+                dec_ret = np.maximum(0.0001, np.where(invested > 0, (total_end / invested) - 1, fallback))
+            rec["ret"][:, yr] = np.where(acc, acc_ret, dec_ret)
+        elif not slack and not alive.any():
+            break
+
+        curr_exp = curr_exp * (1 + inflation)
+        curr_rent = curr_rent * (1 + rent_inflation)
+        if "inflation" in yearly:
+            price_index = price_index * (1 + inflation)
+
+    out = {"survived": alive & terminal_ok}
+    if record:
+        out.update(rec)
+        out["retire_age"] = retire
+    if slack:
+        out["slack"], out["retire_wealth"], out["retire_debt"], out["prepaid"] = slack_out, retire_wealth, retire_debt, prepaid
+    return out
+
+# ==========================================
+# 📈 BATCHED ENGINE FUNCTIONS
+# ==========================================
+def survival_batch(p, extra_sip=0.0, retire_age=None):
+    return run(p, extra_sip, retire_age)["survived"]
+
+def solve_extra_sip_batch(p, retire_age=None):
+    """Same 60-step bisection as calculator.solve_extra_sip_needed, for every row at once."""
+    retire = p["retire_age"] if retire_age is None else np.broadcast_to(np.asarray(retire_age, dtype=int), (p["n"],))
+    out = np.zeros(p["n"])
+    todo = np.flatnonzero(~((retire <= p["age"]) | survival_batch(p, 0.0, retire)))
+    if len(todo) == 0:
+        return out
+
+    # Only rows that actually need extra SIP go through the search
+    sub, sub_retire = take_rows(p, todo), retire[todo]
+    low, high = np.zeros(len(todo)), np.full(len(todo), SIP_SEARCH_HIGH)
+    best = high.copy()
+    for _ in range(SIP_SEARCH_ITERS):
+        mid = (low + high) / 2
+        ok = survival_batch(sub, mid, sub_retire)
+        best = np.where(ok, mid, best)
+        high = np.where(ok, mid, high)
+        low = np.where(ok, low, mid)
+    out[todo] = np.round(best, 2)
+    return out
+
+def forecast_batch(p, retire_age=None):
+    """generate_forecast for every row; returns a list of DataFrames."""
+    res = run(p, 0.0, retire_age, record=True)
+    retire = res["retire_age"]
+    wealth, need, outflow, ret = res["wealth"], res["need"], res["outflow"], res["ret"]
+    frames = []
+    for i in range(p["n"]):
+        L = int(100 - p["age"][i] + 1)
+        ages = p["age"][i] + np.arange(L)
+        targets = np.zeros(L)
+        targets[-1] = need[i, L - 1] * 1.1
+        for j in range(L - 2, -1, -1):
+            if ages[j] >= retire[i]:
+                targets[j] = (targets[j + 1] / (1 + ret[i, j])) + outflow[i, j]
+        retire_idx = max(0, int(retire[i] - p["age"][i]))
+        targets[:retire_idx] = targets[retire_idx] if retire_idx < L else 0
+        frames.append(pd.DataFrame({
+            "Age": ages,
+            "Projected Wealth": wealth[i, :L],
+            "Required Target": targets,
+            "Annual Expense": np.where(ages >= retire[i], outflow[i, :L], need[i, :L]),
+            "Gap": wealth[i, :L] - targets,
+        }))
+    return frames
+
+def evaluate_scenarios(calc_ins):
+    """
+    One batched pass for a list of what-if engine inputs: forecast, gap at the
+    scenario's retirement age, survival to 100 and extra SIP needed.
+    """
+    p = stack_inputs(calc_ins)
+    frames = forecast_batch(p)
+    extra = solve_extra_sip_batch(p)
+    survived = survival_batch(p)
+    out = []
+    for i, df in enumerate(frames):
+        retire = calc_ins[i]['retire_age']
+        row = df[df['Age'] == retire]
+        row = row.iloc[0] if len(row) else df.iloc[-1]
+        out.append({
+            "forecast": df, "gap_val": float(row['Gap']), "wealth_at_retire": float(row['Projected Wealth']),
+            "survives": bool(survived[i]), "extra_sip": float(extra[i])
+        })
+    return out
+
+# ==========================================
+# 🎲 STOCHASTIC RUNS
+# ==========================================
+# Kernel rates driven by each return-model factor (SIP money is equity money; fixed
+# income already follows the FD rate inside the kernel)
+FACTOR_RATES = {
+    "equity": ("r_eq", "r_sip"), "gold": ("r_gold",), "fd": ("gross_fd",), "arbitrage": ("r_arb",),
+    "epf": ("r_epf",), "cash": ("r_cash",), "inflation": ("inflation",), "rent_inflation": ("rent_inflation",),
+}
+
+def apply_shocks(p, shocks):
+    """Turns each row's rates into [n, T] paths: the deterministic rate plus its shock path."""
+    out = dict(p)
+    for f, name in enumerate(returns_model.FACTORS):
+        for key in FACTOR_RATES[name]:
+            out[key] = np.maximum(p[key][:, None] + shocks[:, :, f], returns_model.RATE_FLOOR)
+    return out
+
+def iter_stochastic(data, model=None, n_paths=10000, chunk=returns_model.CHUNK_PATHS, seed=None, extra_sip=0.0, retire_age=None, cancel=None):
+    """
+    Survival flags of one profile under successive chunks of simulated return paths.
+    Stops before the next chunk once `cancel` (a threading.Event) is set.
+    """
+    model = model or returns_model.ReturnModel()
+    base = stack_inputs([data])
+    for shocks in model.iter_shocks(n_paths, 100 - data['age'] + 1, chunk, seed):
+        p = apply_shocks(take_rows(base, np.zeros(len(shocks), dtype=int)), shocks)
+        yield run(p, extra_sip, retire_age)["survived"]
+        if cancel is not None and cancel.is_set():
+            return
+
+def iter_success_probability(data, model=None, n_paths=10000, chunk=returns_model.CHUNK_PATHS, seed=None, extra_sip=0.0, retire_age=None, cancel=None):
+    """Running estimate after every chunk: {"paths", "probability", "stderr"}."""
+    hits = total = 0
+    for ok in iter_stochastic(data, model, n_paths, chunk, seed, extra_sip, retire_age, cancel):
+        hits += int(ok.sum())
+        total += len(ok)
+        prob = hits / total
+        yield {"paths": total, "probability": prob, "stderr": math.sqrt(prob * (1 - prob) / total)}
+
+def success_probability(data, model=None, n_paths=10000, chunk=returns_model.CHUNK_PATHS, seed=None, extra_sip=0.0, retire_age=None):
+    """Share of simulated paths on which the plan lasts to 100."""
+    last = None
+    for last in iter_success_probability(data, model, n_paths, chunk, seed, extra_sip, retire_age):
+        pass
+    return last["probability"] if last else 0.0
+
+# ==========================================
+# 💸 MAXIMUM SUSTAINABLE SPEND
+# ==========================================
+SPEND_TOLERANCE = 1.0    # Monthly, in today's money
+SPEND_MAX_ITERS = 40
+SPEND_SECANT_ITERS = 12  # Afterwards fall back to halving the bracket
+
+def _retire_vec(p, retire_age):
+    return p["retire_age"] if retire_age is None else np.broadcast_to(np.asarray(retire_age, dtype=int), (p["n"],))
+
+def solve_max_spend_batch(p, retire_age=None):
+    """
+    Highest monthly living expense (today's money; rent and the house stay as given) that
+    still lasts to 100, per row. Expenses enter the model linearly, so the terminal slack
+    is piecewise linear in the spend: each step jumps to the root of the line through
+    the current bracket (regula falsi, Illinois variant) instead of halving it, and
+    tests root and root + SPEND_TOLERANCE together to confirm the answer.
+    Returns {"max_spend", "withdrawal_rate", "retire_wealth"} arrays.
+    """
+    n = p["n"]
+    retire = _retire_vec(p, retire_age)
+    spend_run = lambda rows, spend: run(dict(take_rows(p, rows), exp=spend * 12), 0.0, retire[rows], slack=True)
+
+    rows = np.arange(n)
+    first = spend_run(np.concatenate([rows, rows]), np.concatenate([np.zeros(n), np.maximum(p["exp"] / 12, SPEND_TOLERANCE)]))
+    ok, f = first["survived"].reshape(2, n), first["slack"].reshape(2, n)
+    unit = np.maximum(p["exp"] / 12, SPEND_TOLERANCE)
+
+    # Bracket: `a` survives, `b` fails (inf until found)
+    a, fa = np.where(ok[1], unit, 0.0), np.where(ok[1], f[1], f[0])
+    b, fb = np.where(ok[1], np.inf, unit), np.where(ok[1], np.nan, f[1])
+    slope = (f[1] - f[0]) / unit
+    done = ~ok[0]
+    ans = np.zeros(n)
+    side = np.zeros(n, dtype=int)  # Last bracket end moved: -1 = a, +1 = b (Illinois)
+
+    for it in range(SPEND_MAX_ITERS):
+        idx = np.flatnonzero(~done & ((b - a) > SPEND_TOLERANCE))
+        ans = np.where(~done & ((b - a) <= SPEND_TOLERANCE), a, ans)
+        done |= (b - a) <= SPEND_TOLERANCE
+        if len(idx) == 0:
+            break
+        ai, bi, fai, fbi = a[idx], b[idx], fa[idx], fb[idx]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            open_b = np.isinf(bi)
+            guess = np.where(slope[idx] < 0, ai + np.maximum(fai, 0.0) / -slope[idx], np.inf)
+            guess = np.where(open_b, np.maximum(guess, ai * 1.5 + SPEND_TOLERANCE), guess)
+            falsi = ai + np.maximum(fai, 0.0) * (bi - ai) / (np.maximum(fai, 0.0) - fbi)
+        c = np.where(open_b, guess, falsi if it < SPEND_SECANT_ITERS else (ai + bi) / 2)
+        c = np.where(open_b, c, np.clip(np.nan_to_num(c, nan=(ai + bi) / 2), ai, bi - SPEND_TOLERANCE))
+
+        res = spend_run(np.concatenate([idx, idx]), np.concatenate([c, c + SPEND_TOLERANCE]))
+        ok, f = res["survived"].reshape(2, -1), res["slack"].reshape(2, -1)
+
+        hit = ok[0] & ~ok[1]
+        ans[idx[hit]] = c[hit]
+        done[idx[hit]] = True
+        up, down = ok[1], ~ok[0]
+        # Illinois: halve the stale end's slack when the same end moves twice in a row
+        fb[idx] = np.where(up & (side[idx] == -1), fbi / 2, fbi)
+        fa[idx] = np.where(down & (side[idx] == 1), np.maximum(fai, 0.0) / 2, fai)
+        a[idx] = np.where(up, c + SPEND_TOLERANCE, ai)
+        fa[idx] = np.where(up, f[1], fa[idx])
+        b[idx] = np.where(down, c, bi)
+        fb[idx] = np.where(down, f[0], fb[idx])
+        side[idx] = np.where(up, -1, np.where(down, 1, side[idx]))
+    ans = np.where(done, ans, a)
+
+    # Withdrawal rate: first retirement year's spend (plus rent) over wealth at retirement
+    final = spend_run(rows, ans)
+    yrs = np.maximum(0, retire - p["age"])
+    first_need = ans * 12 * (1 + p["inflation"]) ** yrs + np.where(p["rent_forever"], p["rent"] * (1 + p["rent_inflation"]) ** yrs, 0.0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rate = np.where(final["retire_wealth"] > 0, first_need / final["retire_wealth"], 0.0)
+    return {"max_spend": ans, "withdrawal_rate": rate, "retire_wealth": final["retire_wealth"]}
+
+def max_spend_curve(data, ages=None):
+    """Max sustainable monthly spend for every retirement age (default: now to 99), one batch."""
+    ages = np.arange(data['age'], 100) if ages is None else np.asarray(ages, dtype=int)
+    p = take_rows(stack_inputs([data]), np.zeros(len(ages), dtype=int))
+    res = solve_max_spend_batch(p, ages)
+    return pd.DataFrame({
+        "Retire Age": ages, "Max Monthly Spend": res["max_spend"],
+        "Withdrawal Rate": res["withdrawal_rate"], "Wealth at Retirement": res["retire_wealth"],
+    })
+
+# ==========================================
+# 🏦 PREPAY OR INVEST
+# ==========================================
+PREPAY_FRACTIONS = (0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 1.0)  # Of the loan's original principal
+
+def optimize_prepayment(data):
+    """
+    Prepaying a lump sum into the costliest loan vs leaving the money invested (with
+    freed EMIs flowing into SIPs), for every amount in PREPAY_FRACTIONS and every year
+    before the loan ends or retirement, as one batch. Candidates are compared on net
+    worth at retirement (wealth minus outstanding loans). Returns (candidates, best):
+    best is the top candidate, or None when nothing beats staying invested.
+    """
+    loans = data.get('loans', [])
+    if not loans or data['retire_age'] <= data['age']:
+        return pd.DataFrame(), None
+    target = max(range(len(loans)), key=lambda k: loans[k]['rate'])
+    principal = loans[target]['principal']
+    horizon = max(1, min(int(math.ceil(loans[target]['tenure'])), data['retire_age'] - data['age']))
+    grid = [(0.0, -1)] + [(f * principal, y) for y in range(horizon) for f in PREPAY_FRACTIONS]
+
+    p = take_rows(stack_inputs([data]), np.zeros(len(grid), dtype=int))
+    p["prepay_amount"] = np.array([g[0] for g in grid])
+    p["prepay_year"] = np.array([g[1] for g in grid])
+    p["prepay_loan"] = np.full(len(grid), target)
+    res = run(p, slack=True)
+    net = res["retire_wealth"] - res["retire_debt"]
+
+    cands = pd.DataFrame({
+        "Prepay Age": [data['age'] + y if y >= 0 else None for _, y in grid],
+        "Share of Loan": [round(a / principal, 2) if principal else 0.0 for a, _ in grid],
+        "Prepaid": res["prepaid"],
+        "Net Worth at Retirement": net,
+        "Gain vs Investing": net - net[0],
+        "Lasts to 100": res["survived"],
+    })
+    # Prefer plans that last to 100; among those, the highest net worth
+    pool = cands[cands["Lasts to 100"]] if cands["Lasts to 100"].any() else cands
+    best = pool.loc[pool["Net Worth at Retirement"].idxmax()]
+    if best["Gain vs Investing"] <= 0 or best["Prepaid"] <= 0:
+        best = None
+    return cands, best
+
+# ==========================================
+# 🏠 HOUSE-PURCHASE TIMING
+# ==========================================
+HOUSE_AGES_AFTER_RETIRE = 10  # Latest purchase age tried, in years after retirement
+HOUSE_SCALAR_TAIL = 8         # Candidates left when the SIP search hands over to the scalar engine
+
+def optimize_house_age(data):
+    """
+    The "Buy a Home" goal paid at every age from now to HOUSE_AGES_AFTER_RETIRE years
+    after retirement (same down-payment/loan split). Returns (candidates, best), best
+    being {"house_age", "extra_sip"}: the age needing the least extra SIP, and among
+    those (e.g. every age that already lasts to 100) the largest surplus at 100.
+    The SIP bisection prunes candidates the way find_optimal_glide_path does.
+    """
+    if data['housing_goal'] != "Buy a Home":
+        return pd.DataFrame(), None
+    ages = np.arange(data['age'], min(100, data['retire_age'] + HOUSE_AGES_AFTER_RETIRE) + 1)
+    p = take_rows(stack_inputs([data]), np.zeros(len(ages), dtype=int))
+    p["house_age"] = ages
+    res = run(p, slack=True)
+    cands = pd.DataFrame({
+        "Buy at Age": ages,
+        "House Price": data['house_cost'] * (1 + data['inflation']) ** (ages - data['age']),
+        "Surplus at 100": res["slack"],
+        "Lasts to 100": res["survived"],
+    })
+
+    def survives(idx, extra_sip):
+        if len(idx) > HOUSE_SCALAR_TAIL:
+            return survival_batch(take_rows(p, idx), extra_sip)
+        return np.array([calculator.simulate_survival(dict(data, house_age=int(ages[i])), extra_sip, data['retire_age'])
+                         for i in idx], dtype=bool)
+
+    idx, extra = np.arange(len(ages)), 0.0
+    if data['retire_age'] > data['age']:
+        ok = res["survived"]
+        if ok.any():
+            idx = idx[ok]
+        else:
+            low, high = 0.0, SIP_SEARCH_HIGH
+            for _ in range(SIP_SEARCH_ITERS):
+                mid = (low + high) / 2
+                ok = survives(idx, mid)
+                if ok.any():
+                    high, idx = mid, idx[ok]
+                else:
+                    low = mid
+            extra = round(high, 2)
+    best = idx[np.argmax(res["slack"][idx])]
+    return cands, {"house_age": int(ages[best]), "extra_sip": extra}
+
+# ==========================================
+# ⚖️ OLD VS NEW TAX REGIME
+# ==========================================
+def compare_tax_regimes(data):
+    """
+    The whole lifetime under every regime in taxes.REGIMES, side by side (see
+    calculator.with_tax_regime): true FI age from one stacked pass over every regime and
+    candidate retirement age, then the extra SIP needed for all regimes in one search.
+    Returns (table, best), best mapping "earlier_fi" and "lower_sip" to the winning
+    regime, or to None when the regimes tie.
+    """
+    variants = [calculator.with_tax_regime(data, r) for r in taxes.REGIMES]
+    ages = np.arange(data['age'], 100)
+    p = stack_inputs(variants)
+    ok = survival_batch(take_rows(p, np.repeat(np.arange(len(variants)), len(ages))), 0.0,
+                        np.tile(ages, len(variants))).reshape(len(variants), len(ages))
+    fi_age = np.array([ages[row.argmax()] if row.any() else 100 for row in ok])
+    extra = solve_extra_sip_batch(p)
+    table = pd.DataFrame({
+        "Regime": [r.title() for r in taxes.REGIMES],
+        "Take-home Change": [round(calculator.take_home_change(data, r), 2) for r in taxes.REGIMES],
+        "FI Age": fi_age,
+        "Extra SIP Needed": extra,
+    })
+    winner = lambda v: taxes.REGIMES[int(np.argmin(v))] if (v == v.min()).sum() == 1 else None
+    return table, {"earlier_fi": winner(fi_age), "lower_sip": winner(extra)}
+
+# ==========================================
+# 🧭 GLIDE-PATH SEARCH
+# ==========================================
+GLIDE_START_GRID = range(40, 101, 10)   # equity %, before the glide begins
+GLIDE_END_GRID = range(10, 81, 10)      # equity %, at and after retirement
+GLIDE_YEARS_GRID = (0, 5, 10, 15, 20)
+GLIDE_SCALAR_TAIL = 8                   # Candidates left when the search hands over to the scalar engine
+
+def glide_candidates():
+    """Every (start, end, years) on the grid with end <= start, ordered from least to most equity."""
+    out = []
+    for s in GLIDE_START_GRID:
+        for e in GLIDE_END_GRID:
+            if e > s: continue
+            for y in GLIDE_YEARS_GRID:
+                if s == e and y: continue  # A flat path doesn't depend on the glide length
+                out.append((s / 100.0, e / 100.0, y))
+    return sorted(out, key=lambda c: (c[0] + c[1], -c[2]))
+
+def find_optimal_glide_path(data):
+    """
+    find_optimal_allocation over glide paths: the (start, end, years) needing the least
+    extra SIP to retire at data['retire_age'], ties going to the least equity.
+    All candidates share one batch, and the SIP bisection drops every candidate that
+    fails at a level another one survives. Once only a handful are left, the scalar
+    engine (which can stop a simulation early) is cheaper than a mostly-idle batch.
+    """
+    cands = glide_candidates()
+    base = dict(data, retire_mode="glide")
+    p = take_rows(stack_inputs([base]), np.zeros(len(cands), dtype=int))
+    p["glide_start_eq"], p["glide_end_eq"], p["glide_years"] = (np.array(c, dtype=float) for c in zip(*cands))
+
+    def survives(idx, extra_sip):
+        if len(idx) > GLIDE_SCALAR_TAIL:
+            return survival_batch(take_rows(p, idx), extra_sip)
+        return np.array([calculator.simulate_survival(
+            dict(base, glide_start_eq=cands[i][0], glide_end_eq=cands[i][1], glide_years=cands[i][2]),
+            extra_sip, data['retire_age']) for i in idx], dtype=bool)
+
+    idx, extra = np.arange(len(cands)), 0.0
+    if data['retire_age'] > data['age']:
+        ok = survives(idx, 0.0)
+        if ok.any():
+            idx = idx[ok]
+        else:
+            low, high = 0.0, SIP_SEARCH_HIGH
+            for _ in range(SIP_SEARCH_ITERS):
+                mid = (low + high) / 2
+                ok = survives(idx, mid)
+                if ok.any():
+                    high, idx = mid, idx[ok]
+                else:
+                    low = mid
+            extra = round(high, 2)
+
+    start, end, years = cands[idx[0]]
+    return {"glide_start_eq": start, "glide_end_eq": end, "glide_years": years, "extra_sip": extra}
@@ -1,6 +1,59 @@
+import math
 import pandas as pd
 import taxes
 
+ENGINE_VERSION = "2026.10.1"  # Bump whenever simulation semantics change; cached results key on it
+HOUSING_OPTIONS = ["Rent Forever", "Buy a Home", "Already Own"]
+GLIDE_DEFAULTS = {"glide_start_eq": 0.8, "glide_end_eq": 0.4, "glide_years": 10}
+# "Buy a Home": purchase age (None = at retirement), share paid upfront, home-loan terms for the rest
+HOUSE_DEFAULTS = {"house_age": None, "house_down": 1.0, "house_loan_rate": 0.085, "house_loan_tenure": 20}
+# Rebalancing back to the "dynamic" split after retirement: never, every year, or once
+# equity drifts more than `rebalance_band` away from `equity_alloc`
+REBALANCE_POLICIES = ("off", "annual", "band")
+REBALANCE_BAND = 0.05
+# Buckets a goal can be earmarked against, in withdrawal order; None = the usual withdrawal order
+GOAL_BUCKETS = ("cash", "fd", "fixed_income", "arbitrage", "gold", "sip_corpus", "equity", "epf")
+TAX_SLAB_OPTIONS = [0.0, 0.05, 0.10, 0.15, 0.20, 0.25, 0.30, 0.35, 0.40]
+
+def build_calc_input(db):
+    """
+    Translates the wizard vault (percentages, option indices) into the engine's
+    input dict (decimals, post-tax rates). Shared by the app and batch jobs.
+    """
+    age = db.get("age", 30)
+    tax_slab = TAX_SLAB_OPTIONS[int(db.get("tax_slab_idx", 6))]
+    use_post_tax = db.get("use_post_tax", True)
+    post_tax = lambda key, default, asset: taxes.calculate_post_tax_rate(db.get(key, default) / 100.0, asset, tax_slab, use_post_tax)
+
+    return {
+        "age": age, "retire_age": max(age, db.get("retire_age", 60)),
+        "living_expense": db.get("living_expense", 0), "rent": db.get("rent", 0), "current_sip": db.get("current_sip", 0),
+        "monthly_pf": db.get("monthly_pf", 0), "step_up": db.get("step_up", 10) / 100.0,
+        "inflation": db.get("inflation", 6.0) / 100.0, "rent_inflation": db.get("rent_inflation", 8.0) / 100.0,
+        "house_cost": db.get("house_cost", 0), "housing_goal": HOUSING_OPTIONS[int(db.get("housing_idx", 0))],
+        "house_age": db.get("house_age") or None, "house_down": db.get("house_down_pct", 100) / 100.0,
+        "house_loan_rate": db.get("house_loan_rate", 8.5) / 100.0, "house_loan_tenure": db.get("house_loan_tenure", 20),
+        "cash": db.get("cash", 0), "fd": db.get("fd", 0), "epf": db.get("epf", 0),
+        "mutual_funds": db.get("mutual_funds", 0), "stocks": db.get("stocks", 0), "gold": db.get("gold", 0),
+        "arbitrage": db.get("arbitrage", 0), "fixed_income": db.get("fixed_income", 0),
+        "rate_savings": 0.03,
+        "rate_epf": post_tax("rate_epf", 8.1, "EPF"),
+        "rate_equity": post_tax("rate_equity", 12.0, "Equity"),
+        "rate_gold": post_tax("rate_gold", 8.0, "Gold"),
+        "rate_arbitrage": post_tax("rate_arbitrage", 7.5, "Arbitrage"),
+        "rate_fd_gross": db.get("rate_fd_gross", 7.0) / 100.0,
+        "rate_new_sip": post_tax("rate_sip", 12.0, "Equity"),
+        "rate_fixed": post_tax("rate_fixed", 7.5, "Debt"),
+        "salary": db.get("income", 0) * 12, "tax_regime": db.get("tax_regime", "new"), "tax_deductions": db.get("tax_deductions", 0),
+        "goals": [{
+            "name": g.get("name", ""), "age": int(g["age"]), "amount": g["amount"], "years": int(g.get("years") or 1),
+            "inflation": None if g.get("inflation") is None else g["inflation"] / 100.0, "bucket": g.get("bucket"),
+        } for g in db.get("goals", []) if g.get("age") and g.get("amount")],
+        "loans": [{"principal": db.get("loan_principal", 0), "rate": db.get("loan_rate", 9.0) / 100.0, "tenure": db.get("loan_tenure", 0)}]
+                 if db.get("loan_principal", 0) > 0 and db.get("loan_tenure", 0) > 0 else [],
+        "retire_mode": "off"
+    }
+
 def get_actual_return(cash, fd, fixed_income, arbitrage, gold, equity, sip_corpus, epf, 
                       r_cash, r_fd, r_fixed, r_arb, r_gold, r_eq, r_sip, r_epf, 
                       safe_retire_mode, curr_age, target_retire_age):
@@ -10,6 +63,251 @@ def get_actual_return(cash, fd, fixed_income, arbitrage, gold, equity, sip_corpu
     return (cash*r_cash + fd*r_fd + fixed_income*r_fixed + arbitrage*r_arb + 
             gold*r_gold + equity*r_eq + sip_corpus*r_sip + epf*r_epf) / total
 
+def rebalance_policy(data):
+    """(policy, band) for a dynamic-mode run; other modes never rebalance."""
+    policy = data.get('rebalance', 'off')
+    if policy not in REBALANCE_POLICIES:
+        raise ValueError(f"Unknown rebalancing policy: {policy}")
+    return (policy if data.get('retire_mode', 'off') == "dynamic" else "off"), data.get('rebalance_band', REBALANCE_BAND)
+
+def tax_regime(data):
+    """(regime, yearly old-regime deductions) the profile files under; see taxes.REGIMES."""
+    regime = data.get('tax_regime', 'new')
+    if regime not in taxes.REGIMES:
+        raise ValueError(f"Unknown tax regime: {regime}")
+    return regime, data.get('tax_deductions', 0)
+
+def take_home_change(data, regime):
+    """Monthly change in take-home pay if the profile filed under `regime` instead (same gross salary)."""
+    own, deductions = tax_regime(data)
+    salary = data.get('salary', 0)
+    if regime == own or salary <= 0:
+        return 0.0
+    gross = taxes.gross_salary(salary, own, data['age'], deductions)
+    return (gross - taxes.salary_tax(gross, regime, data['age'], deductions) - salary) / 12
+
+def with_tax_regime(data, regime):
+    """
+    `data` as if the profile filed under `regime`: retirement interest is taxed under it,
+    and the change in take-home pay is invested as SIP while working.
+    """
+    out = dict(data, tax_regime=regime)
+    tax_regime(out)  # Rejects an unknown `regime`
+    change = take_home_change(data, regime)
+    if change:
+        out['current_sip'] = max(data['current_sip'] + change, 0.0)
+    return out
+
+def glide_equity(data, current_age, retire_age):
+    """
+    Equity share on a glide path ('glide' retire_mode): flat at the start share, then a
+    straight line down over `glide_years` to the end share at retirement, flat after that.
+    """
+    start = data.get('glide_start_eq', GLIDE_DEFAULTS['glide_start_eq'])
+    end = data.get('glide_end_eq', GLIDE_DEFAULTS['glide_end_eq'])
+    years = data.get('glide_years', GLIDE_DEFAULTS['glide_years'])
+    if years <= 0:
+        frac = 1.0 if current_age >= retire_age else 0.0
+    else:
+        frac = min(1.0, max(0.0, (current_age - (retire_age - years)) / years))
+    return start + (end - start) * frac
+
+# ==========================================
+# 🏦 LOANS (amortization schedules)
+# `loans` is a list of {"principal", "rate" (annual, decimal), "tenure" (years)}.
+# EMIs come out of salary while working: whatever part of the EMI budget a loan no
+# longer needs (after it closes or is prepaid) is invested in SIPs. After retirement
+# any remaining EMIs are withdrawn from the portfolio like expenses.
+# ==========================================
+def loan_emi(principal, rate, years):
+    """Monthly EMI that clears `principal` at annual `rate` in `years`."""
+    months = int(round(years * 12))
+    if principal <= 0 or months <= 0:
+        return 0.0
+    i = rate / 12
+    if i == 0:
+        return principal / months
+    return principal * i / (1 - (1 + i) ** -months)
+
+def loan_state(data):
+    """Per loan: [balance, yearly growth factor, year-end value of 12 EMIs, cash of 12 EMIs]."""
+    state = []
+    for ln in data.get('loans', []):
+        emi = loan_emi(ln['principal'], ln['rate'], ln['tenure'])
+        i = ln['rate'] / 12
+        growth = (1 + i) ** 12
+        annuity = 12.0 if i == 0 else (growth - 1) / i
+        state.append([float(ln['principal']), growth, emi * annuity, emi * 12])
+    return state
+
+def pay_loans(state):
+    """
+    One year of EMIs (balances updated in place). Returns the cash paid; a loan that
+    closes this year needs only the share of the year's EMIs that its balance is worth.
+    """
+    paid = 0.0
+    for ln in state:
+        grown = ln[0] * ln[1]
+        rest = grown - ln[2]
+        if rest <= 0:
+            paid += grown * ln[3] / ln[2] if ln[2] > 0 else grown
+            ln[0] = 0.0
+        else:
+            paid += ln[3]
+            ln[0] = rest
+    return paid
+
+def house_loan_state(data, principal):
+    """Loan state (as in loan_state) for the part of the house price not paid upfront."""
+    return loan_state({"loans": [{
+        "principal": principal,
+        "rate": data.get('house_loan_rate', HOUSE_DEFAULTS['house_loan_rate']),
+        "tenure": data.get('house_loan_tenure', HOUSE_DEFAULTS['house_loan_tenure']),
+    }]})
+
+def house_buy_age(data, retire_age):
+    """Age at which the "Buy a Home" goal is paid for (defaults to the retirement year)."""
+    house_age = data.get('house_age')
+    return max(data['age'], int(house_age)) if house_age else retire_age
+
+def withdraw(buckets, amount):
+    """Takes `amount` from the buckets in order; returns (buckets, amount left unpaid)."""
+    rem = amount
+    for i, b in enumerate(buckets):
+        take = min(b, rem)
+        buckets[i] = b - take
+        rem -= take
+    return buckets, rem
+
+def loan_years_left(state):
+    """Years until every loan is repaid on schedule."""
+    state = [list(ln) for ln in state]
+    years = 0
+    while any(ln[0] > 0 for ln in state) and years <= 100:
+        pay_loans(state)
+        years += 1
+    return years
+
+def apply_prepayment(buckets, state, idx, amount):
+    """Pays up to `amount` off loan `idx` from the liquid buckets in withdrawal order (EPF stays locked)."""
+    rem = want = min(amount, state[idx][0])
+    for i, b in enumerate(buckets):
+        take = min(b, rem)
+        buckets[i] = b - take
+        rem -= take
+    state[idx][0] -= want - rem
+    return buckets
+
+# ==========================================
+# 🎯 GOALS (sparse cash-flow schedules)
+# `goals` is a list of {"age", "amount" (today's money), "years" (yearly repeats, default 1),
+# "inflation" (own yearly growth; None = general inflation), "bucket" (GOAL_BUCKETS name
+# paid from first; None = the usual withdrawal order)}. Compiled once per run into one
+# outflow list per funding source, so the yearly loop only indexes into them.
+# ==========================================
+def compile_goals(data, split=False):
+    """
+    Returns {source: [outflow per year from now to 100]}, source being an index into
+    GOAL_BUCKETS or len(GOAL_BUCKETS) for the withdrawal order. With split=True returns
+    (own, real) instead: goals on their own inflation rate, and generally-inflated goals
+    in today's money (for runs that follow their own inflation path).
+    """
+    years = 100 - data['age'] + 1
+    schedule, own, real = {}, {}, {}
+    for g in data.get('goals', []):
+        bucket = g.get('bucket')
+        if bucket is not None and bucket not in GOAL_BUCKETS:
+            raise ValueError(f"Unknown goal bucket: {bucket}")
+        src = len(GOAL_BUCKETS) if bucket is None else GOAL_BUCKETS.index(bucket)
+        general = g.get('inflation') is None
+        rate = data['inflation'] if general else g['inflation']
+        for out in (schedule, own, real):
+            out.setdefault(src, [0.0] * years)
+        for yr in range(max(0, g['age'] - data['age']), min(years, g['age'] - data['age'] + g.get('years', 1))):
+            schedule[src][yr] += g['amount'] * ((1 + rate) ** yr)
+            if general:
+                real[src][yr] += g['amount']
+            else:
+                own[src][yr] += g['amount'] * ((1 + rate) ** yr)
+    if split:
+        return own, real
+    return {src: schedule[src] for src in sorted(schedule)}
+
+def last_goal_year(schedule):
+    """Index of the last year with any goal outflow (-1 if none)."""
+    return max([yr for out in schedule.values() for yr, amt in enumerate(out) if amt] or [-1])
+
+def fund_goals(buckets, schedule, yr):
+    """
+    Pays this year's goals: earmarked buckets first (as far as they go), the rest is left
+    for the withdrawal order. Returns (buckets, amount for the withdrawal order, amount paid
+    from earmarked buckets).
+    """
+    direct = rest = 0.0
+    for src, out in schedule.items():
+        amt = out[yr]
+        if not amt: continue
+        if src == len(GOAL_BUCKETS):
+            rest += amt
+        else:
+            take = min(buckets[src], amt)
+            buckets[src] -= take
+            direct += take
+            rest += amt - take
+    return buckets, rest, direct
+
+# ==========================================
+# ✂️ PROVABLE EARLY EXIT FOR SURVIVAL CHECKS
+# ==========================================
+BOUND_EPS = 1e-9      # Relative slack so float rounding can never flip an early verdict
+BOUND_EVERY = 12      # Re-test cadence (years); a test costs more than one simulated year
+
+def _required_corpus(need_parts, r, years_left):
+    """
+    Wealth needed at the start of this year to pay every remaining need and clear the
+    1.1x terminal target at 100, if the whole corpus compounds at exactly `r`.
+    `need_parts` are (amount this year, annual growth) pairs, e.g. expenses and rent.
+    """
+    total = 0.0
+    for amt, g in need_parts:
+        if amt <= 0: continue
+        q = (1 + g) / (1 + r)
+        qm = q ** years_left
+        annuity = (years_left + 1) if abs(q - 1) < 1e-12 else (1 - qm * q) / (1 - q)
+        total += amt * (annuity + 1.1 * qm / (1 + r))
+    return total
+
+def _survival_bound(balances, rates_hi, order_lo, need_parts, years_left):
+    """
+    Called at the start of a pure decumulation year (no inflows, no lumpy outflows left).
+    Returns True/False when the rest of the simulation is already decided, else None.
+    `order_lo` lists (bucket index, guaranteed rate) from the fastest-growing bucket down.
+
+    Survival is monotone in every bucket balance, so:
+    - Certain failure: all wealth compounding at the best bucket rate still falls short.
+    - Certain success: the buckets growing at >= r alone cover the required corpus at r.
+    """
+    wealth, r_hi = 0.0, -1.0
+    for bal, hi in zip(balances, rates_hi):
+        if bal > 0:
+            wealth += bal
+            if hi > r_hi: r_hi = hi
+    if wealth <= 0 or r_hi <= -1:
+        return None
+
+    if wealth < _required_corpus(need_parts, r_hi, years_left) * (1 - BOUND_EPS):
+        return False
+
+    funded = 0.0
+    for n, (idx, r) in enumerate(order_lo):
+        if balances[idx] <= 0: continue
+        funded += balances[idx]
+        # Only test once every bucket at this rate is included
+        if n + 1 < len(order_lo) and order_lo[n + 1][1] == r: continue
+        if r > -1 and funded >= _required_corpus(need_parts, r, years_left) * (1 + BOUND_EPS):
+            return True
+    return None
+
 def simulate_survival(data, extra_sip, test_retire_age):
     age = data['age']
     retire_mode = data.get('retire_mode', 'off') 
@@ -33,15 +331,48 @@ def simulate_survival(data, extra_sip, test_retire_age):
     rent_inflation = data['rent_inflation']
     house_cost = data['house_cost']
     housing_goal = data['housing_goal']
+    buys_home = housing_goal == "Buy a Home"
+    buy_age = house_buy_age(data, test_retire_age)
+    house_down = data.get('house_down', 1.0)
+    house_loan = []
     
     sip_corpus = 0.0
     
+    # Early-exit bounds: FD interest is taxed at an average rate of at most the top slab plus cess
+    fd_net_lo = gross_fd_rate * (1 - taxes.TOP_SLAB_RATE * (1 + taxes.CESS))
+    rates_lo = (r_cash, min(gross_fd_rate, fd_net_lo), gross_fd_rate * 0.7, r_arb, r_gold, r_sip, r_eq, r_epf)
+    rates_hi = (r_cash, max(gross_fd_rate, fd_net_lo), gross_fd_rate * 0.7, r_arb, r_gold, r_sip, r_eq, r_epf)
+    order_lo = sorted(enumerate(rates_lo), key=lambda x: -x[1])
+    rebalance, band = rebalance_policy(data)
+    regime, tax_deductions = tax_regime(data)
+    if retire_mode == "glide" or rebalance != "off":
+        # Re-balancing moves money between FD and equity, so only their common floor is safe
+        r_floor = min(rates_lo[1], rates_lo[6])
+        order_lo = [(i, r_floor) for i in range(len(rates_lo))]
+    next_bound_age = max(test_retire_age, buy_age + 1) if buys_home else test_retire_age
+    
+    loans = loan_state(data)
+    emi_budget = sum(ln[3] for ln in loans)
+    prepay_year = data.get('prepay_year', -1) if loans else -1
+    if loans:
+        next_bound_age = max(next_bound_age, age + loan_years_left(loans), age + prepay_year + 1)
+    goals = compile_goals(data)
+    if goals:
+        next_bound_age = max(next_bound_age, age + last_goal_year(goals) + 1)
+    
     for yr in range(100 - age + 1):
         current_age = age + yr
-        annual_need = curr_exp + (curr_rent if housing_goal == "Rent Forever" else 0)
+        pays_rent = housing_goal == "Rent Forever" or (buys_home and current_age < buy_age)
+        annual_need = curr_exp + (curr_rent if pays_rent else 0)
         
-        # 🛡️ RETIREMENT PORTFOLIO SHIFT
-        if current_age == test_retire_age:
+        # 🛡️ RETIREMENT PORTFOLIO SHIFT (a glide path re-balances every year instead)
+        if retire_mode == "glide":
+            eq_alloc = glide_equity(data, current_age, test_retire_age)
+            total_wealth = cash + fd + epf + equity + gold + arbitrage + fixed_income + sip_corpus
+            fd = total_wealth * (1.0 - eq_alloc)
+            equity = total_wealth * eq_alloc
+            cash = epf = gold = arbitrage = fixed_income = sip_corpus = 0
+        elif current_age == test_retire_age:
             total_wealth = cash + fd + epf + equity + gold + arbitrage + fixed_income + sip_corpus
             if retire_mode == "100_fd":
                 fd = total_wealth
@@ -51,11 +382,68 @@ def simulate_survival(data, extra_sip, test_retire_age):
                 fd = total_wealth * (1.0 - eq_alloc)
                 equity = total_wealth * eq_alloc
                 cash = epf = gold = arbitrage = fixed_income = sip_corpus = 0
+        elif rebalance != "off" and current_age > test_retire_age:
+            # ⚖️ Restore the retirement split every year, or once equity leaves its band
+            eq_alloc = data.get('equity_alloc', 0.4)
+            total_wealth = cash + fd + epf + equity + gold + arbitrage + fixed_income + sip_corpus
+            if rebalance == "annual" or (total_wealth > 0 and abs(equity / total_wealth - eq_alloc) > band):
+                fd = total_wealth * (1.0 - eq_alloc)
+                equity = total_wealth * eq_alloc
+                cash = epf = gold = arbitrage = fixed_income = sip_corpus = 0
+
+        # ✂️ EARLY EXIT once only pure decumulation years remain
+        if current_age >= next_bound_age:
+            need_parts = ((curr_exp, inflation), (curr_rent, rent_inflation)) if housing_goal == "Rent Forever" else ((curr_exp, inflation),)
+            verdict = _survival_bound((cash, fd, fixed_income, arbitrage, gold, sip_corpus, equity, epf),
+                                      rates_hi, order_lo, need_parts, 100 - current_age)
+            if verdict is not None:
+                return verdict
+            next_bound_age = current_age + BOUND_EVERY
+
+        # 🏦 LOANS: optional lump-sum prepayment, then this year's EMIs
+        if yr == prepay_year:
+            cash, fd, fixed_income, arbitrage, gold, sip_corpus, equity = apply_prepayment(
+                [cash, fd, fixed_income, arbitrage, gold, sip_corpus, equity], loans, data.get('prepay_loan', 0), data.get('prepay_amount', 0))
+        emi_paid = pay_loans(loans) if loans else 0.0
+
+        # 🏠 HOUSE PURCHASE: down payment this year, the rest as a home loan starting now
+        house_out = house_emi = 0.0
+        if buys_home and current_age == buy_age:
+            house_price = house_cost * ((1+inflation)**yr)
+            house_out = house_price * house_down
+            if house_down < 1:
+                house_loan = house_loan_state(data, house_price * (1 - house_down))
+                next_bound_age = max(next_bound_age, current_age + loan_years_left(house_loan))
+        if house_loan:
+            house_emi = pay_loans(house_loan)
+
+        # 🎯 GOALS: earmarked buckets pay first, the rest joins this year's withdrawals
+        goal_out = 0.0
+        if goals:
+            (cash, fd, fixed_income, arbitrage, gold, sip_corpus, equity, epf), goal_out, _ = fund_goals(
+                [cash, fd, fixed_income, arbitrage, gold, sip_corpus, equity, epf], goals, yr)
 
         # ACCUMULATION 
         if current_age < test_retire_age:
+            # An owner no longer pays rent from salary: the rent budget services the home
+            # loan, any surplus is invested and any shortfall comes out of the portfolio
+            rent_saved = 0.0
+            if buys_home and current_age >= buy_age:
+                house_out += max(0.0, house_emi - curr_rent)
+                rent_saved = max(0.0, curr_rent - house_emi)
+            acc_out = house_out + goal_out
+            if acc_out > 0:
+                (cash, fd, fixed_income, arbitrage, gold, sip_corpus, equity, epf), rem = withdraw(
+                    [cash, fd, fixed_income, arbitrage, gold, sip_corpus, equity, epf], acc_out)
+                if rem > 0.01:
+                    return False
+            
             epf += (epf * r_epf) + (monthly_pf * 12)
             sip_corpus += (sip_corpus * r_sip) + annual_sip
+            if loans:
+                sip_corpus += emi_budget - emi_paid
+            if rent_saved:
+                sip_corpus += rent_saved
             annual_sip *= (1 + step_up)
             
             cash += cash * r_cash
@@ -68,8 +456,14 @@ def simulate_survival(data, extra_sip, test_retire_age):
         # DECUMULATION
         else:
             outflow = annual_need
-            if housing_goal == "Buy a Home" and current_age == test_retire_age:
-                outflow += house_cost * ((1+inflation)**yr)
+            if house_out:
+                outflow += house_out
+            if house_loan:
+                outflow += house_emi
+            if loans:
+                outflow += emi_paid
+            if goal_out:
+                outflow += goal_out
             
             rem = outflow
             if cash >= rem: cash -= rem; rem = 0
@@ -93,7 +487,7 @@ def simulate_survival(data, extra_sip, test_retire_age):
                 return False 
             
             fd_gross_interest = fd * gross_fd_rate
-            tax_amount = taxes.calculate_india_tax(fd_gross_interest)
+            tax_amount = taxes.interest_tax(fd_gross_interest, regime, current_age, tax_deductions)
             fd_net_interest = fd_gross_interest - tax_amount
             
             cash += cash * r_cash
@@ -138,6 +532,23 @@ def solve_extra_sip_needed(data):
             low = mid
     return round(best, 2)
 
+ALLOCATION_SWEEP = range(10, 85, 5)  # Equity % tried by the dynamic-blend sweep
+
+def iter_allocation_sweep(data, cancel=None):
+    """
+    Yields (equity share, extra SIP needed) for 10%..80% equity in the dynamic blend,
+    one allocation at a time, so callers can show results as they arrive.
+    Stops early once `cancel` (a threading.Event) is set.
+    """
+    for eq in ALLOCATION_SWEEP:
+        if cancel is not None and cancel.is_set():
+            return
+        eq_pct = eq / 100.0
+        test_data = data.copy()
+        test_data['retire_mode'] = 'dynamic'
+        test_data['equity_alloc'] = eq_pct
+        yield eq_pct, solve_extra_sip_needed(test_data)
+
 def find_optimal_allocation(data):
     """
     Sweeps through Equity allocations (10% to 80%) to find the absolute mathematically safest 
@@ -146,14 +557,7 @@ def find_optimal_allocation(data):
     best_eq = 0.5 
     lowest_sip = float('inf')
     
-    for eq in range(10, 85, 5):
-        eq_pct = eq / 100.0
-        test_data = data.copy()
-        test_data['retire_mode'] = 'dynamic'
-        test_data['equity_alloc'] = eq_pct
-        
-        req_sip = solve_extra_sip_needed(test_data)
-        
+    for eq_pct, req_sip in iter_allocation_sweep(data):
         if req_sip == 0:
             return eq_pct # Found the safest portfolio that guarantees survival
         
@@ -163,7 +567,13 @@ def find_optimal_allocation(data):
             
     return best_eq
 
-def generate_forecast(data):
+BUCKET_COLUMNS = ["Cash", "FD", "Fixed Income", "Arbitrage", "Gold", "Equity", "SIP Corpus", "EPF"]
+
+def generate_forecast(data, buckets=False):
+    """
+    Year-by-year wealth vs. required target. With `buckets=True` the start-of-year
+    balance of every bucket is included as well (see BUCKET_COLUMNS).
+    """
     age = data['age']
     target_retire_age = data['retire_age']
     retire_mode = data.get('retire_mode', 'off')
@@ -187,6 +597,10 @@ def generate_forecast(data):
     rent_inflation = data['rent_inflation']
     house_cost = data['house_cost']
     housing_goal = data['housing_goal']
+    buys_home = housing_goal == "Buy a Home"
+    buy_age = house_buy_age(data, target_retire_age)
+    house_down = data.get('house_down', 1.0)
+    house_loan = []
     
     sip_corpus = 0.0
     
@@ -194,13 +608,28 @@ def generate_forecast(data):
     raw_expenses = []
     raw_outflows = []
     raw_returns = []
+    raw_buckets = []
+    
+    loans = loan_state(data)
+    emi_budget = sum(ln[3] for ln in loans)
+    prepay_year = data.get('prepay_year', -1) if loans else -1
+    goals = compile_goals(data)
+    rebalance, band = rebalance_policy(data)
+    regime, tax_deductions = tax_regime(data)
     
     for yr in range(100 - age + 1):
         current_age = age + yr
-        annual_need = curr_exp + (curr_rent if housing_goal == "Rent Forever" else 0)
+        pays_rent = housing_goal == "Rent Forever" or (buys_home and current_age < buy_age)
+        annual_need = curr_exp + (curr_rent if pays_rent else 0)
         raw_expenses.append(annual_need)
         
-        if current_age == target_retire_age:
+        if retire_mode == "glide":
+            eq_alloc = glide_equity(data, current_age, target_retire_age)
+            total_wealth = cash + fd + epf + equity + gold + arbitrage + fixed_income + sip_corpus
+            fd = total_wealth * (1.0 - eq_alloc)
+            equity = total_wealth * eq_alloc
+            cash = epf = gold = arbitrage = fixed_income = sip_corpus = 0
+        elif current_age == target_retire_age:
             total_wealth = cash + fd + epf + equity + gold + arbitrage + fixed_income + sip_corpus
             if retire_mode == "100_fd":
                 fd = total_wealth
@@ -210,14 +639,57 @@ def generate_forecast(data):
                 fd = total_wealth * (1.0 - eq_alloc)
                 equity = total_wealth * eq_alloc
                 cash = epf = gold = arbitrage = fixed_income = sip_corpus = 0
+        elif rebalance != "off" and current_age > target_retire_age:
+            # ⚖️ Restore the retirement split every year, or once equity leaves its band
+            eq_alloc = data.get('equity_alloc', 0.4)
+            total_wealth = cash + fd + epf + equity + gold + arbitrage + fixed_income + sip_corpus
+            if rebalance == "annual" or (total_wealth > 0 and abs(equity / total_wealth - eq_alloc) > band):
+                fd = total_wealth * (1.0 - eq_alloc)
+                equity = total_wealth * eq_alloc
+                cash = epf = gold = arbitrage = fixed_income = sip_corpus = 0
 
         start_wealth = cash + fd + epf + equity + gold + arbitrage + fixed_income + sip_corpus
         raw_wealth.append(start_wealth)
+        if buckets:
+            raw_buckets.append((cash, fd, fixed_income, arbitrage, gold, equity, sip_corpus, epf))
+        
+        if yr == prepay_year:
+            cash, fd, fixed_income, arbitrage, gold, sip_corpus, equity = apply_prepayment(
+                [cash, fd, fixed_income, arbitrage, gold, sip_corpus, equity], loans, data.get('prepay_loan', 0), data.get('prepay_amount', 0))
+        emi_paid = pay_loans(loans) if loans else 0.0
+        freed_emi = emi_budget - emi_paid if loans else 0.0
+        
+        house_out = house_emi = 0.0
+        if buys_home and current_age == buy_age:
+            house_price = house_cost * ((1+inflation)**yr)
+            house_out = house_price * house_down
+            if house_down < 1:
+                house_loan = house_loan_state(data, house_price * (1 - house_down))
+        if house_loan:
+            house_emi = pay_loans(house_loan)
+        
+        goal_out = goal_direct = 0.0
+        if goals:
+            (cash, fd, fixed_income, arbitrage, gold, sip_corpus, equity, epf), goal_out, goal_direct = fund_goals(
+                [cash, fd, fixed_income, arbitrage, gold, sip_corpus, equity, epf], goals, yr)
         
         if current_age < target_retire_age:
             raw_outflows.append(0)
+            rent_saved = 0.0
+            if buys_home and current_age >= buy_age:
+                house_out += max(0.0, house_emi - curr_rent)
+                rent_saved = max(0.0, curr_rent - house_emi)
+            acc_out = house_out + goal_out
+            if acc_out > 0:
+                (cash, fd, fixed_income, arbitrage, gold, sip_corpus, equity, epf), _ = withdraw(
+                    [cash, fd, fixed_income, arbitrage, gold, sip_corpus, equity, epf], acc_out)
+            
             epf += (epf * r_epf) + (monthly_pf * 12)
             sip_corpus += (sip_corpus * r_sip) + annual_sip
+            if loans:
+                sip_corpus += freed_emi
+            if rent_saved:
+                sip_corpus += rent_saved
             annual_sip *= (1 + step_up)
             
             cash += cash * r_cash
@@ -228,14 +700,21 @@ def generate_forecast(data):
             equity += equity * r_eq
             
             total_end = cash + fd + epf + equity + gold + arbitrage + fixed_income + sip_corpus
-            eff_return = ((total_end - annual_sip - (monthly_pf*12)) / start_wealth) - 1 if start_wealth > 0 else r_eq
+            eff_return = ((total_end - annual_sip - (monthly_pf*12) - freed_emi - rent_saved + acc_out + goal_direct) / start_wealth) - 1 if start_wealth > 0 else r_eq
             raw_returns.append(eff_return)
             
         else:
             outflow = annual_need
-            if housing_goal == "Buy a Home" and current_age == target_retire_age:
-                outflow += house_cost * ((1+inflation)**yr)
-            raw_outflows.append(outflow)
+            if house_out:
+                outflow += house_out
+            if house_loan:
+                outflow += house_emi
+            if loans:
+                outflow += emi_paid
+            if goal_out:
+                outflow += goal_out
+            spent = outflow + goal_direct if goal_direct else outflow  # Earmarked goal money left too
+            raw_outflows.append(spent)
             
             rem = outflow
             if cash >= rem: cash -= rem; rem = 0
@@ -256,7 +735,7 @@ def generate_forecast(data):
             elif epf > 0: rem -= epf; epf = 0
             
             fd_gross_interest = fd * gross_fd_rate
-            tax_amount = taxes.calculate_india_tax(fd_gross_interest)
+            tax_amount = taxes.interest_tax(fd_gross_interest, regime, current_age, tax_deductions)
             fd_net_interest = fd_gross_interest - tax_amount
             
             cash += cash * r_cash
@@ -271,7 +750,7 @@ def generate_forecast(data):
             total_end = cash + fd + epf + equity + gold + arbitrage + fixed_income + sip_corpus
             
             # --- THE BUG FIX: Calculate effective return on the INVESTED capital, ignoring the outflow ---
-            invested_capital = start_wealth - outflow
+            invested_capital = start_wealth - spent
             
             if invested_capital > 0:
                 eff_return = (total_end / invested_capital) - 1
@@ -300,12 +779,35 @@ def generate_forecast(data):
     forecast = []
     for i in range(len(raw_wealth)):
         curr_age = age + i
-        forecast.append({
+        row = {
             "Age": curr_age,
             "Projected Wealth": raw_wealth[i],
             "Required Target": targets[i],
             "Annual Expense": raw_outflows[i] if curr_age >= target_retire_age else raw_expenses[i],
             "Gap": raw_wealth[i] - targets[i]
-        })
+        }
+        if buckets:
+            row.update(zip(BUCKET_COLUMNS, raw_buckets[i]))
+        forecast.append(row)
         
-    return pd.DataFrame(forecast)
\ No newline at end of file
+    return pd.DataFrame(forecast)
+
+def compute_results(calc_in):
+    """
+    The headline numbers shown on the results page (and stored in `user_data`):
+    base forecast, gap at the desired retirement age, true FI age and extra SIP.
+    """
+    base_df = generate_forecast(calc_in, buckets=True)
+    retire_age = calc_in['retire_age']
+    target_row = base_df[base_df['Age'] == retire_age].iloc[0] if retire_age in base_df['Age'].values else base_df.iloc[-1]
+    gap_val = float(target_row['Gap'])
+    practical_age = int(calculate_true_fi_age(calc_in))
+    extra_sip_req = math.ceil(float(solve_extra_sip_needed(calc_in)))
+    
+    if gap_val < -10 and extra_sip_req == 0:
+        extra_sip_req = 1
+    
+    return {
+        "base_df": base_df, "target_row": target_row, "gap_val": gap_val,
+        "practical_age": practical_age, "extra_sip_req": extra_sip_req
+    }
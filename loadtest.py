@@ -0,0 +1,238 @@
+"""
+🏋️ CONCURRENT-SESSION LOAD TEST FOR THE STREAMLIT APP
+Drives app.py headlessly (Streamlit's AppTest) through the welcome screen, the four
+wizard steps and the results page for N simulated sessions running on threads, the
+same way the Streamlit server runs one script thread per browser tab. Sessions pick
+a persona card and, for a share of them, type randomized values into the wizard.
+Supabase is swapped for an in-process stand-in with a configurable round-trip
+latency. Caches are cleared first, so every run starts like a freshly booted server.
+
+AppTest is written for one test at a time: each run installs a throwaway global
+Runtime and clears it again when done, which breaks any run still in flight on
+another thread, and recompiles the script (ast.parse isn't thread-safe on 3.11).
+While the load test runs, Runtime lookups fall back to the most recent one, all runs
+share one script cache like the real server does, and the test secrets and config
+are set once globally. Those patches reach into Streamlit internals (checked against
+streamlit 1.66); on a version without them the load test refuses to start.
+
+    python loadtest.py --sessions 32 --concurrency 16
+    python loadtest.py --sessions 8 --supabase-latency 0.2 --tracemalloc --timeout 600
+
+Reports latency percentiles per step, failed steps and peak memory (max RSS; with
+--tracemalloc also the peak of Python allocations, at a noticeable speed cost).
+"""
+import json
+import os
+import random
+import resource
+import sys
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+import streamlit as st
+from streamlit.runtime import Runtime
+from streamlit.runtime.secrets import Secrets
+from streamlit.runtime.scriptrunner.script_cache import ScriptCache
+from streamlit.testing.v1 import AppTest, app_test, local_script_runner
+from streamlit.testing.v1.util import patch_config_options
+
+import personas
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py")
+STREAMLIT_TESTED = "1.66.0"  # Version the runtime patches below were written against
+STEP_TIMEOUT = 120.0  # seconds one script run may take before the step counts as failed
+
+STEPS = ("welcome", "profile", "safety_debts", "invested_assets", "strategy", "results")
+NEXT_BUTTONS = ("Next: Safety & Debts", "Next: Invested Assets", "Next: Strategy & Growth", "View Financial Reality")
+PERSONA_BUTTONS = {"techie": "The City Techie", "family": "The Family", "fire": "The FIRE Chaser"}
+
+# Money inputs a randomized session rescales by a random factor
+JITTER_KEYS = ("income", "living_expense", "rent", "cash", "fd", "epf", "mutual_funds", "stocks", "gold", "current_sip")
+JITTER_RANGE = (0.5, 1.5)
+
+# ==========================================
+# ☁️ SUPABASE STAND-IN
+# ==========================================
+class LocalSupabase:
+    """Just enough of the supabase client for `client.table(name).upsert(row).execute()`."""
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.tables = {}
+        self._lock = threading.Lock()
+
+    def table(self, name):
+        return _LocalQuery(self, name)
+
+class _LocalQuery:
+    def __init__(self, client, name):
+        self.client, self.name, self.row = client, name, None
+
+    def upsert(self, row):
+        self.row = row
+        return self
+
+    def execute(self):
+        time.sleep(self.client.latency)  # Network round-trip to the hosted database
+        with self.client._lock:
+            self.client.tables.setdefault(self.name, {})[self.row["id"]] = dict(self.row)
+        return self
+
+# ==========================================
+# 🧵 APPTEST ACROSS THREADS
+# ==========================================
+def _check_internals():
+    """Fails fast if this Streamlit lacks an internal _SharedTestRuntime patches."""
+    missing = [name for name, ok in (
+        ("Runtime.instance", isinstance(Runtime.__dict__.get("instance"), classmethod)),
+        ("Runtime.exists", isinstance(Runtime.__dict__.get("exists"), classmethod)),
+        ("Runtime._instance", "_instance" in Runtime.__dict__),
+        ("app_test.ScriptCache", getattr(app_test, "ScriptCache", None) is ScriptCache),
+        ("local_script_runner.ScriptCache", getattr(local_script_runner, "ScriptCache", None) is ScriptCache),
+        ("ScriptCache.get_bytecode", hasattr(ScriptCache, "get_bytecode")),
+        ("Secrets._secrets", "_secrets" in vars(Secrets())),
+    ) if not ok]
+    if missing:
+        raise RuntimeError(
+            f"loadtest.py patches Streamlit internals missing from streamlit {st.__version__} "
+            f"({', '.join(missing)}); it was written against {STREAMLIT_TESTED}"
+        )
+
+class _SharedTestRuntime:
+    """Context manager that lets AppTest runs overlap on threads (see the module docstring)."""
+    def __init__(self, secrets):
+        self.secrets = secrets
+
+    def __enter__(self):
+        _check_internals()
+        last = [None]
+        def instance(cls):
+            if cls._instance is not None:
+                last[0] = cls._instance
+            if last[0] is None:
+                raise RuntimeError("Runtime hasn't been created!")
+            return last[0]
+        self._patched = {"instance": Runtime.__dict__["instance"], "exists": Runtime.__dict__["exists"]}
+        Runtime.instance = classmethod(instance)
+        Runtime.exists = classmethod(lambda cls: cls._instance is not None or last[0] is not None)
+        script_cache = ScriptCache()
+        script_cache.get_bytecode(APP_PATH)  # Compiled up front, before any threads start
+        app_test.ScriptCache = local_script_runner.ScriptCache = lambda: script_cache
+
+        self._saved_secrets = st.secrets
+        st.secrets = Secrets()
+        st.secrets._secrets = dict(self.secrets)
+        self._config = patch_config_options({"global.appTest": True})
+        self._config.__enter__()
+        return self
+
+    def __exit__(self, *exc):
+        self._config.__exit__(*exc)
+        st.secrets = self._saved_secrets
+        app_test.ScriptCache = local_script_runner.ScriptCache = ScriptCache
+        for name, attr in self._patched.items():
+            setattr(Runtime, name, attr)
+
+# ==========================================
+# 🧑‍🤝‍🧑 ONE SIMULATED SESSION
+# ==========================================
+def _click(at, label):
+    matches = [b for b in at.button if label in b.label]
+    if not matches:
+        raise RuntimeError(f"No button labelled {label!r} on this page")
+    matches[0].click()
+
+def _jitter_inputs(at, rng):
+    """Types randomized values into whatever wizard inputs the current page shows."""
+    keys = {w.key for w in at.number_input}
+    if "age" in keys:
+        age = rng.randint(22, 45)
+        at.number_input(key="age").set_value(age)
+        at.number_input(key="retire_age").set_value(rng.randint(max(age + 5, 45), 65))
+    for key in JITTER_KEYS:
+        if key in keys:
+            widget = at.number_input(key=key)
+            widget.set_value(int(widget.value * rng.uniform(*JITTER_RANGE)))
+
+def run_session(idx, persona, randomize, seed, timeout=STEP_TIMEOUT):
+    """Walks one session through every step; returns {"latencies": {step: seconds}, "error": str or None}."""
+    rng = random.Random(seed)
+    at = AppTest.from_file(APP_PATH, default_timeout=timeout)
+    latencies = {}
+    buttons = (None, PERSONA_BUTTONS[persona]) + NEXT_BUTTONS  # What is clicked to reach each step
+    for step, label in zip(STEPS, buttons):
+        try:
+            if label in NEXT_BUTTONS and randomize:
+                _jitter_inputs(at, rng)
+            if label:
+                _click(at, label)
+            t0 = time.perf_counter()
+            at.run()
+            latencies[step] = time.perf_counter() - t0
+        except Exception as e:
+            return {"session": idx, "latencies": latencies, "error": f"{step}: {e}"}
+        if at.exception:
+            return {"session": idx, "latencies": latencies, "error": f"{step}: {at.exception[0].message}"}
+    return {"session": idx, "latencies": latencies, "error": None}
+
+# ==========================================
+# 📈 RUN & REPORT
+# ==========================================
+def _percentiles(values):
+    values = sorted(values)
+    pct = lambda q: values[min(len(values) - 1, int(q * len(values)))] * 1000
+    return {"n": len(values), "p50_ms": pct(0.50), "p95_ms": pct(0.95), "p99_ms": pct(0.99), "max_ms": values[-1] * 1000}
+
+def load_test(sessions=16, concurrency=None, random_share=0.5, supabase_latency=0.05, seed=0, timeout=STEP_TIMEOUT, trace=False):
+    """Runs `sessions` simulated sessions, `concurrency` at a time; returns the report dict."""
+    import supabase
+    fake = LocalSupabase(supabase_latency)
+    real_create = supabase.create_client
+    supabase.create_client = lambda url, key: fake
+    st.cache_resource.clear()
+    st.cache_data.clear()
+
+    rng = random.Random(seed)
+    plan = [(i, rng.choice(list(personas.PERSONAS)), rng.random() < random_share, rng.randrange(2**32)) for i in range(sessions)]
+    if trace:
+        tracemalloc.start()
+    t0 = time.perf_counter()
+    try:
+        with _SharedTestRuntime({"SUPABASE_URL": "http://localhost", "SUPABASE_KEY": "loadtest"}):
+            with ThreadPoolExecutor(max_workers=concurrency or sessions) as pool:
+                results = list(pool.map(lambda p: run_session(*p, timeout=timeout), plan))
+    finally:
+        supabase.create_client = real_create
+    elapsed = time.perf_counter() - t0
+    traced_peak = tracemalloc.get_traced_memory()[1] if trace else None
+    if trace:
+        tracemalloc.stop()
+
+    per_step = {step: [r["latencies"][step] for r in results if step in r["latencies"]] for step in STEPS}
+    return {
+        "sessions": sessions,
+        "concurrency": concurrency or sessions,
+        "completed": sum(r["error"] is None for r in results),
+        "errors": [f"session {r['session']} at {r['error']}" for r in results if r["error"]],
+        "elapsed_s": elapsed,
+        "sessions_per_min": sessions / elapsed * 60,
+        "steps": {step: _percentiles(v) for step, v in per_step.items() if v},
+        "rows_saved": len(fake.tables.get("user_data", {})),
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (1024 if sys.platform != "darwin" else 1024 ** 2),
+        "traced_peak_mb": None if traced_peak is None else traced_peak / 1024 ** 2,
+    }
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Concurrent-session load test for app.py")
+    parser.add_argument("--sessions", type=int, default=16)
+    parser.add_argument("--concurrency", type=int, default=None, help="Sessions in flight at once (default: all)")
+    parser.add_argument("--random-share", type=float, default=0.5, help="Share of sessions that type randomized inputs")
+    parser.add_argument("--supabase-latency", type=float, default=0.05, help="Seconds per simulated upsert")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--timeout", type=float, default=STEP_TIMEOUT)
+    parser.add_argument("--tracemalloc", action="store_true")
+    args = parser.parse_args()
+    print(json.dumps(load_test(args.sessions, args.concurrency, args.random_share, args.supabase_latency,
+                               args.seed, args.timeout, args.tracemalloc), indent=2))
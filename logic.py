@@ -1,33 +1,143 @@
-def run_diagnostics(data):
+import numpy as np
+import pandas as pd
+import calculator
+
+# ==========================================
+# 📋 DECLARATIVE DIAGNOSTIC RULES
+# Each rule is an ordered list of (outcome, condition, message). The first condition
+# that holds wins; `None` is the fallback. Conditions are plain column expressions,
+# so the same rule evaluates on one profile (dict of scalars) or on a whole
+# DataFrame of profiles (Series), and messages are only rendered for display.
+# ==========================================
+INPUT_DEFAULTS = {"emi": 0}
+
+DERIVED = {
+    "monthly_exp": lambda c: c["monthly_expense"] + c["emi"],
+    "liq": lambda c: c["cash"] + c["fd"],
+}
+
+class _Fields(dict):
+    """Profile fields; derived ones are computed on first read, so a rule only needs the inputs it uses."""
+    def __missing__(self, key):
+        if key not in DERIVED:
+            raise KeyError(key)
+        val = self[key] = DERIVED[key](self)
+        return val
+
+RULES = {
+    "emergency": [
+        ("PASS", lambda c: c["liq"] >= c["monthly_exp"] * 6, "Great! You have {months} months of emergency funds."),
+        ("ALERT", lambda c: c["liq"] >= c["monthly_exp"] * 3, "You have {months} months of expenses. Target 6 months."),
+        ("FAIL", None, "Low liquidity ({months} months). Build up cash/FD to cover 6 months."),
+    ],
+    "debt": [
+        ("FAIL", lambda c: c["emi"] > c["income"] * 0.4, "EMIs consume over 40% of income. High risk!"),
+        ("ALERT", lambda c: c["emi"] > 0, "Manageable debt, but aim to become debt-free before retirement."),
+        ("PASS", None, "Zero EMI burden! Excellent."),
+    ],
+    "life": [
+        ("PASS", lambda c: c["dependents"] <= 0, "No dependents, life cover is optional."),
+        ("PASS", lambda c: c["term_insurance"] >= c["income"] * 12 * 10, "Adequate life cover for dependents."),
+        ("FAIL", None, "Increase term life insurance to at least 10x annual income."),
+    ],
+    "health": [
+        ("PASS", lambda c: (c["health_insurance"] >= 1000000) | (c["health_insurance"] >= c["income"] * 3), "Adequate health insurance cover."),
+        ("ALERT", None, "Consider increasing your health cover to at least 10-15 Lakhs."),
+    ],
+    "house": [
+        ("ALERT", lambda c: (c["housing_goal"] == "Buy a Home") & (c["liq"] < c["house_cost"] * 0.2), "If buying a house soon, your liquid down-payment (20%) is falling short."),
+        ("PASS", None, "Housing plan aligns with current assets."),
+    ],
+    "peace": [
+        ("PASS", lambda c: c["liq"] >= c["income"] * 12, "You have 1+ years of runway. True peace of mind!"),
+        ("ALERT", None, "Keep investing to build a 1-year 'Peace Fund' for complete job flexibility."),
+    ],
+}
+
+ARBITRAGE_RULE = [
+    ("SWITCH", lambda c: (c["tax_slab"] >= 0.3) & (c["fd"] > 500000), "You are in the 30%+ tax slab with large FDs. Moving some FD money to Arbitrage Mutual Funds could reduce your tax from 30% to 12.5%."),
+    ("NONE", None, "Asset allocation looks tax-efficient for your bracket."),
+]
+
+ALL_RULES = dict(RULES, arbitrage=ARBITRAGE_RULE)
+
+# Status codes are stable small ints so a column of them is cheap to store and aggregate
+STATUS_CODES = {"PASS": 0, "ALERT": 1, "FAIL": 2, "NONE": 0, "SWITCH": 1}
+
+def _message_fields(c):
+    months = c["liq"] / c["monthly_exp"] if c["monthly_exp"] else float("inf")
+    return {"months": round(months, 1)}
+
+# ==========================================
+# 🧮 EVALUATION
+# ==========================================
+def _pick(rule, c):
+    """Index of the first matching clause for a single profile."""
+    for i, (_, cond, _) in enumerate(rule):
+        if cond is None or cond(c):
+            return i
+    return len(rule) - 1
+
+def evaluate_rules(df, rules=None):
+    """
+    Vectorized evaluation over a DataFrame of profiles. Returns one int8 column of
+    status codes per rule; use `render_diagnostics` to turn a row back into messages.
+    """
+    rules = rules or ALL_RULES
+    c = _Fields({k: df[k] if k in df else pd.Series(v, index=df.index) for k, v in INPUT_DEFAULTS.items()})
+    c.update({k: df[k] for k in df.columns if k not in c})
+
+    out = {}
+    for name, rule in rules.items():
+        clauses = [cl for cl in rule if cl[1] is not None]
+        conds = [np.asarray(cond(c), dtype=bool) for _, cond, _ in clauses]
+        codes = [STATUS_CODES[outcome] for outcome, _, _ in clauses]
+        out[name] = np.select(conds, codes, default=STATUS_CODES[rule[-1][0]]).astype(np.int8)
+    return pd.DataFrame(out, index=df.index)
+
+def render_diagnostics(data, rules=None):
+    """Scalar path: evaluates and renders messages for one profile."""
+    rules = rules or ALL_RULES
+    c = _Fields(INPUT_DEFAULTS)
+    c.update(data)
+
     res = {}
-    monthly_exp = data['monthly_expense'] + data.get('emi', 0)
-    liq = data['cash'] + data['fd']
-    
-    if liq >= monthly_exp * 6: res['emergency'] = {"status": "PASS", "msg": f"Great! You have {round(liq/monthly_exp, 1)} months of emergency funds."}
-    elif liq >= monthly_exp * 3: res['emergency'] = {"status": "ALERT", "msg": f"You have {round(liq/monthly_exp, 1)} months of expenses. Target 6 months."}
-    else: res['emergency'] = {"status": "FAIL", "msg": f"Low liquidity ({round(liq/monthly_exp, 1)} months). Build up cash/FD to cover 6 months."}
-        
-    if data['emi'] > data['income'] * 0.4: res['debt'] = {"status": "FAIL", "msg": "EMIs consume over 40% of income. High risk!"}
-    elif data['emi'] > 0: res['debt'] = {"status": "ALERT", "msg": "Manageable debt, but aim to become debt-free before retirement."}
-    else: res['debt'] = {"status": "PASS", "msg": "Zero EMI burden! Excellent."}
-        
-    if data['dependents'] > 0:
-        if data['term_insurance'] >= data['income'] * 12 * 10: res['life'] = {"status": "PASS", "msg": "Adequate life cover for dependents."}
-        else: res['life'] = {"status": "FAIL", "msg": "Increase term life insurance to at least 10x annual income."}
-    else: res['life'] = {"status": "PASS", "msg": "No dependents, life cover is optional."}
-        
-    if data['health_insurance'] >= 1000000 or (data['health_insurance'] >= data['income']*3): res['health'] = {"status": "PASS", "msg": "Adequate health insurance cover."}
-    else: res['health'] = {"status": "ALERT", "msg": "Consider increasing your health cover to at least 10-15 Lakhs."}
-        
-    if data['housing_goal'] == "Buy a Home" and liq < data['house_cost'] * 0.2: res['house'] = {"status": "ALERT", "msg": "If buying a house soon, your liquid down-payment (20%) is falling short."}
-    else: res['house'] = {"status": "PASS", "msg": "Housing plan aligns with current assets."}
-         
-    if liq >= data['income'] * 12: res['peace'] = {"status": "PASS", "msg": "You have 1+ years of runway. True peace of mind!"}
-    else: res['peace'] = {"status": "ALERT", "msg": "Keep investing to build a 1-year 'Peace Fund' for complete job flexibility."}
-        
+    for name, rule in rules.items():
+        outcome, _, msg = rule[_pick(rule, c)]
+        res[name] = {"status": outcome, "msg": msg.format(**_message_fields(c)) if "{" in msg else msg}
     return res
 
+def profile_from_vault(db):
+    """Maps wizard-vault keys onto the fields the rules read."""
+    return {
+        "monthly_expense": db.get("living_expense", 0) + db.get("rent", 0), "emi": db.get("emi", 0),
+        "cash": db.get("cash", 0), "fd": db.get("fd", 0), "income": db.get("income", 0),
+        "dependents": db.get("dependents", 0), "term_insurance": db.get("term_insurance", 0),
+        "health_insurance": db.get("health_insurance", 0), "house_cost": db.get("house_cost", 0),
+        "housing_goal": calculator.HOUSING_OPTIONS[int(db.get("housing_idx", 0))],
+        "tax_slab": calculator.TAX_SLAB_OPTIONS[int(db.get("tax_slab_idx", 6))],
+    }
+
+def profiles_from_rows(df):
+    """profile_from_vault for a DataFrame of stored `user_data` rows (see the DB auto-save payload in app.py)."""
+    num = lambda k: pd.to_numeric(df[k], errors="coerce").fillna(0) if k in df else pd.Series(0.0, index=df.index)
+    slab_idx = num("tax_slab").astype(int).clip(0, len(calculator.TAX_SLAB_OPTIONS) - 1)
+    return pd.DataFrame({
+        "monthly_expense": num("living_expense") + num("rent"), "emi": num("emi"),
+        "cash": num("cash"), "fd": num("fd"), "income": num("income"),
+        "dependents": num("dependents"), "term_insurance": num("term_insurance"),
+        "health_insurance": num("health_insurance"), "house_cost": num("house_cost"),
+        "housing_goal": df["housing_goal"] if "housing_goal" in df else calculator.HOUSING_OPTIONS[0],
+        "tax_slab": np.take(calculator.TAX_SLAB_OPTIONS, slab_idx),
+    }, index=df.index)
+
+def status_names(rule):
+    """Status code -> outcome name for one rule."""
+    return {STATUS_CODES[outcome]: outcome for outcome, _, _ in rule}
+
+def run_diagnostics(data):
+    return render_diagnostics(data, RULES)
+
 def check_arbitrage_hack(data):
-    if data['tax_slab'] >= 0.3 and data['fd'] > 500000:
-        return {"action": "SWITCH", "msg": "You are in the 30%+ tax slab with large FDs. Moving some FD money to Arbitrage Mutual Funds could reduce your tax from 30% to 12.5%."}
-    return {"action": "NONE", "msg": "Asset allocation looks tax-efficient for your bracket."}
\ No newline at end of file
+    res = render_diagnostics(data, {"arbitrage": ARBITRAGE_RULE})["arbitrage"]
+    return {"action": res["status"], "msg": res["msg"]}
@@ -0,0 +1,35 @@
+# ==========================================
+# 🧑‍💻 PERSONA DATA LIBRARY
+# Wizard-vault values for the quick-start cards (INR). Shared by the app and the API.
+# ==========================================
+PERSONAS = {
+    "techie": {
+        "age": 28, "retire_age": 55, "dependents": 2, "income": 150000, "living_expense": 40000, "rent": 35000,
+        "tax_slab_idx": 6, "use_post_tax": True, "cash": 100000, "fd": 0, "credit_limit": 450000, "emi": 0,
+        "term_insurance": 15000000, "health_insurance": 1000000, "epf": 300000, "mutual_funds": 800000, 
+        "stocks": 200000, "gold": 0, "arbitrage": 0, "fixed_income": 0, "step_up": 10, "inflation": 6.0, 
+        "housing_idx": 0, "house_cost": 15000000, "rent_inflation": 8.0, "rate_sip": 12.0, "rate_equity": 12.0, 
+        "rate_fd_gross": 7.0, "rate_epf": 8.1, "rate_gold": 8.0, "rate_arbitrage": 7.5, "rate_fixed": 7.5,
+        "current_sip": 40000, "monthly_pf": 14400
+    },
+    "family": {
+        "age": 36, "retire_age": 60, "dependents": 3, "income": 90000, "living_expense": 35000, "rent": 15000,
+        "tax_slab_idx": 4, "use_post_tax": True, "cash": 150000, "fd": 500000, "credit_limit": 200000, "emi": 15000,
+        "loan_principal": 1200000, "loan_rate": 8.5, "loan_tenure": 10,
+        "term_insurance": 10000000, "health_insurance": 500000, "epf": 1200000, "mutual_funds": 200000, 
+        "stocks": 50000, "gold": 100000, "arbitrage": 0, "fixed_income": 200000, "step_up": 5, "inflation": 6.0, 
+        "housing_idx": 1, "house_cost": 8000000, "rent_inflation": 8.0, "rate_sip": 11.0, "rate_equity": 11.0, 
+        "rate_fd_gross": 7.0, "rate_epf": 8.1, "rate_gold": 8.0, "rate_arbitrage": 7.5, "rate_fixed": 7.5,
+        "current_sip": 15000, "monthly_pf": 9600,
+        "goals": [{"name": "Child's College", "age": 48, "amount": 600000, "years": 4, "inflation": 10.0, "bucket": None}]
+    },
+    "fire": {
+        "age": 32, "retire_age": 45, "dependents": 1, "income": 250000, "living_expense": 60000, "rent": 40000,
+        "tax_slab_idx": 6, "use_post_tax": True, "cash": 300000, "fd": 0, "credit_limit": 500000, "emi": 0,
+        "term_insurance": 20000000, "health_insurance": 2000000, "epf": 800000, "mutual_funds": 2500000, 
+        "stocks": 1000000, "gold": 0, "arbitrage": 0, "fixed_income": 0, "step_up": 15, "inflation": 6.0, 
+        "housing_idx": 0, "house_cost": 20000000, "rent_inflation": 8.0, "rate_sip": 13.0, "rate_equity": 13.0, 
+        "rate_fd_gross": 7.0, "rate_epf": 8.1, "rate_gold": 8.0, "rate_arbitrage": 7.5, "rate_fixed": 7.5,
+        "current_sip": 100000, "monthly_pf": 19200
+    }
+}
@@ -0,0 +1,180 @@
+"""
+🔁 BULK RE-SCORING AFTER A BUDGET UPDATE
+When the constants in taxes.py change, every stored practical_age / gap_val /
+extra_sip_req in `user_data` is stale. This job streams the stored profiles,
+recomputes them across a process pool and writes back only the score columns of
+rows whose outcome changed (batched UPDATEs over DB-API; on Supabase one upsert per
+page of the full rows carrying the new scores). Progress is checkpointed per page so an interrupted run resumes where
+it stopped.
+
+    python rescore.py --sqlite local.db
+    python rescore.py --supabase --workers 8
+"""
+import json
+import os
+import sqlite3
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import analytics
+import calculator
+import taxes
+
+CHECKPOINT_PATH = "rescore_checkpoint.json"
+PAGE_SIZE = 500
+SCORE_COLUMNS = ["practical_age", "gap_val", "extra_sip_req"]
+GAP_TOLERANCE = 1.0  # Currency units; below this a gap change is float noise
+# Engine inputs stored since loans, house timing, goals and tax regimes joined the model;
+# a row without them can't be re-scored faithfully, so it is left untouched
+ENGINE_COLUMNS = (
+    "loan_principal", "loan_rate", "loan_tenure", "house_age", "house_down_pct", "house_loan_rate",
+    "house_loan_tenure", "goals", "tax_regime", "tax_deductions",
+)
+
+# ==========================================
+# 🧩 STORED ROW -> ENGINE INPUT
+# ==========================================
+def row_to_vault(row):
+    """
+    Maps a `user_data` row (see the DB auto-save payload in app.py) back onto wizard vault keys.
+    Raises ValueError for a row missing any of ENGINE_COLUMNS.
+    """
+    missing = [k for k in ENGINE_COLUMNS if row.get(k) is None]
+    if missing:
+        raise ValueError(f"Row {row.get('id')} has no {', '.join(missing)}")
+    vault = {k: row[k] for k in (
+        "age", "retire_age", "dependents", "income", "living_expense", "rent", "use_post_tax", "cash", "fd",
+        "credit_limit", "emi", "term_insurance", "health_insurance", "epf", "mutual_funds", "stocks", "gold",
+        "arbitrage", "fixed_income", "current_sip", "step_up", "house_cost", "inflation", "rent_inflation",
+        "rate_epf", "rate_equity", "rate_gold", "rate_arbitrage", "rate_fixed"
+    ) if row.get(k) is not None}
+    vault["monthly_pf"] = row.get("basic_salary") or 0
+    vault["tax_slab_idx"] = int(row.get("tax_slab") or 0)
+    vault["rate_sip"] = row.get("rate_new_sip", 12.0)
+    vault["rate_fd_gross"] = row.get("rate_fd", 7.0)
+    goal = row.get("housing_goal")
+    vault["housing_idx"] = calculator.HOUSING_OPTIONS.index(goal) if goal in calculator.HOUSING_OPTIONS else 0
+    vault.update({k: row[k] for k in ENGINE_COLUMNS})
+    if isinstance(vault["goals"], str):  # JSON text outside Supabase's jsonb
+        vault["goals"] = json.loads(vault["goals"])
+    return vault
+
+def rescore_row(row):
+    """Returns the changed score columns for a row (with its id), or None if nothing moved."""
+    res = calculator.compute_results(calculator.build_calc_input(row_to_vault(row)))
+    fresh = {"practical_age": res["practical_age"], "gap_val": res["gap_val"], "extra_sip_req": float(res["extra_sip_req"])}
+
+    old_gap = row.get("gap_val")
+    changed = (
+        row.get("practical_age") != fresh["practical_age"]
+        or row.get("extra_sip_req") is None or float(row["extra_sip_req"]) != fresh["extra_sip_req"]
+        or old_gap is None or abs(float(old_gap) - fresh["gap_val"]) > GAP_TOLERANCE
+    )
+    if not changed:
+        return None
+    fresh["id"] = row["id"]
+    return fresh
+
+def rescore_page(rows, full_rows=False):
+    """Changed rows of a page: id + score columns, or with `full_rows` the whole stored row with fresh scores."""
+    out = []
+    for row in rows:
+        try:
+            upd = rescore_row(row)
+        except (KeyError, ValueError, ZeroDivisionError, IndexError):
+            continue  # Incomplete legacy rows (see ENGINE_COLUMNS) are left untouched
+        if upd is not None:
+            out.append(dict(row, **upd) if full_rows else upd)
+    return out
+
+# ==========================================
+# 💾 BATCHED WRITE-BACK & CHECKPOINTS
+# ==========================================
+def write_changes(target, changes, table="user_data"):
+    if not changes:
+        return
+    if hasattr(target, "table"):
+        # One round trip per page; the rows are complete (see rescore_page), so the upsert only ever updates
+        target.table(table).upsert(changes).execute()
+        return
+    mark = "?" if isinstance(target, sqlite3.Connection) else "%s"
+    sets = ", ".join(f"{c} = {mark}" for c in SCORE_COLUMNS)
+    cur = target.cursor()
+    cur.executemany(
+        f"UPDATE {table} SET {sets} WHERE id = {mark}",
+        [tuple(c[k] for k in SCORE_COLUMNS) + (c["id"],) for c in changes]
+    )
+    target.commit()
+    cur.close()
+
+def load_checkpoint(path=CHECKPOINT_PATH):
+    try:
+        with open(path) as f:
+            ckpt = json.load(f)
+    except (OSError, ValueError):
+        return None
+    # A checkpoint from an older budget is useless: the whole table must be redone
+    return ckpt if ckpt.get("tax_version") == taxes.TAX_VERSION else None
+
+def save_checkpoint(ckpt, path=CHECKPOINT_PATH):
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(ckpt, f)
+    os.replace(tmp, path)
+
+def run(source, target=None, workers=None, page_size=PAGE_SIZE, path=CHECKPOINT_PATH, resume=True, table="user_data"):
+    """
+    Streams pages from `source`, scores them on a process pool (a few pages in flight)
+    and writes changed rows to `target` in page order, checkpointing after every page.
+    """
+    target = target if target is not None else source
+    ckpt = load_checkpoint(path) if resume else None
+    if ckpt is None:
+        ckpt = {"tax_version": taxes.TAX_VERSION, "last_id": None, "scanned": 0, "updated": 0, "started_at": time.time()}
+    if ckpt.get("done"):
+        return ckpt
+
+    workers = workers or os.cpu_count() or 1
+    full_rows = hasattr(target, "table")  # Supabase writes whole rows back; DB-API only the score columns
+    inflight = deque()
+
+    def drain_one():
+        last_id, n_rows, fut = inflight.popleft()
+        changes = fut.result()
+        write_changes(target, changes, table)
+        ckpt["last_id"] = last_id
+        ckpt["scanned"] += n_rows
+        ckpt["updated"] += len(changes)
+        save_checkpoint(ckpt, path)
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for page in analytics.iter_pages(source, table, "*", page_size, ckpt["last_id"]):
+            inflight.append((page[-1]["id"], len(page), pool.submit(rescore_page, page, full_rows)))
+            if len(inflight) >= workers * 2:
+                drain_one()
+        while inflight:
+            drain_one()
+
+    ckpt["done"] = True
+    ckpt["finished_at"] = time.time()
+    save_checkpoint(ckpt, path)
+    return ckpt
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Re-score stored results against the current tax version")
+    parser.add_argument("--sqlite", help="Path to a local SQLite copy of user_data")
+    parser.add_argument("--supabase", action="store_true", help="Use SUPABASE_URL / SUPABASE_KEY")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--page-size", type=int, default=PAGE_SIZE)
+    parser.add_argument("--checkpoint", default=CHECKPOINT_PATH)
+    parser.add_argument("--restart", action="store_true", help="Ignore any existing checkpoint")
+    args = parser.parse_args()
+
+    if args.supabase:
+        from supabase import create_client
+        src = create_client(os.environ["SUPABASE_URL"], os.environ["SUPABASE_KEY"])
+    else:
+        src = sqlite3.connect(args.sqlite or "user_data.db")
+    print(json.dumps(run(src, workers=args.workers, page_size=args.page_size, path=args.checkpoint, resume=not args.restart), indent=2))
@@ -0,0 +1,202 @@
+"""
+🗄️ RESULT STORE
+Process-wide cache of full results bundles keyed by a hash of the engine input plus the
+engine and tax versions, so a version bump invalidates everything automatically.
+Warmed in the background with the built-in personas at process start, and after each
+results render with the vaults one typical edit away (speculative neighbourhood).
+"""
+import hashlib
+import json
+import threading
+import time
+import weakref
+from collections import OrderedDict
+
+import batch
+import calculator
+import logic
+import share
+import taxes
+
+MAX_ENTRIES = 512
+
+# Most-edited wizard inputs and the nudges tried around them, most likely first
+NEIGHBOUR_STEPS = (
+    ("retire_age", 1), ("retire_age", -1),
+    ("current_sip", 5000), ("current_sip", -5000),
+    ("rate_sip", 1.0), ("rate_sip", -1.0),
+    ("rate_equity", 1.0), ("rate_equity", -1.0),
+)
+SPECULATION_CPU_BUDGET = 5.0  # CPU seconds one speculation run may spend
+MAX_SPECULATORS = 1           # Speculation threads running at once, across all sessions
+
+def _canonical(obj):
+    # Widgets hand back 600000.0 where a persona holds 600000; both must hash alike
+    if isinstance(obj, float) and obj.is_integer():
+        return int(obj)
+    if isinstance(obj, dict):
+        return {k: _canonical(v) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [_canonical(v) for v in obj]
+    return obj
+
+def input_key(obj):
+    """Version-scoped hash of any JSON-able engine input (integral floats hash as ints)."""
+    blob = json.dumps(_canonical(obj), sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(f"{calculator.ENGINE_VERSION}|{taxes.TAX_VERSION}|{blob}".encode()).hexdigest()
+
+def bundle_key(db):
+    """Hash of exactly what the bundle depends on: the engine input and the diagnostics profile."""
+    return input_key({"calc": calculator.build_calc_input(db), "diag": logic.profile_from_vault(db)})
+
+def neighbour_vaults(db, steps=NEIGHBOUR_STEPS):
+    """Vaults one edit away from `db`, in `steps` order (edits the wizard wouldn't accept are skipped)."""
+    for key, step in steps:
+        val = db.get(key, 0) + step
+        if val < 0 or (key == "retire_age" and not db.get("age", 30) <= val <= share.NUMBER_RANGES["retire_age"][1]):
+            continue
+        yield dict(db, **{key: val})
+
+def compute_bundle(db):
+    """Everything the results page needs for one vault: forecast, FI age, extra SIP, allocation, glide path, max spend,
+    loan prepayment, house timing, tax regimes, diagnostics."""
+    calc_in = calculator.build_calc_input(db)
+    bundle = calculator.compute_results(calc_in)
+    bundle["calc_in"] = calc_in
+    bundle["optimal_equity"] = calculator.find_optimal_allocation(calc_in)
+    bundle["glide_path"] = batch.find_optimal_glide_path(calc_in)
+    bundle["max_spend"] = batch.max_spend_curve(calc_in)
+    bundle["prepayment"] = batch.optimize_prepayment(calc_in)
+    bundle["house_timing"] = batch.optimize_house_age(calc_in)
+    bundle["tax_regimes"] = batch.compare_tax_regimes(calc_in)
+    prof = logic.profile_from_vault(db)
+    bundle["diagnostics"] = logic.run_diagnostics(prof)
+    bundle["arbitrage"] = logic.check_arbitrage_hack(prof)
+    return bundle
+
+class ResultStore:
+    """Thread-safe LRU of results bundles."""
+    def __init__(self, max_entries=MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._speculators = threading.BoundedSemaphore(MAX_SPECULATORS)
+        self._shared = OrderedDict()  # share-token hash -> bundle key
+
+    def get(self, key):
+        with self._lock:
+            bundle = self._data.get(key)
+            if bundle is not None:
+                self._data.move_to_end(key)
+            return bundle
+
+    def put(self, key, bundle):
+        with self._lock:
+            self._data[key] = bundle
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def get_or_compute(self, db):
+        key = bundle_key(db)
+        with self._lock:
+            bundle = self._data.get(key)
+            if bundle is not None:
+                self._data.move_to_end(key)
+                return bundle
+            pending = self._pending.get(key)
+            owner = pending is None
+            if owner:
+                pending = self._pending[key] = threading.Event()
+        
+        # Someone (usually the warm-up thread) is already computing this exact input
+        if not owner:
+            pending.wait()
+            bundle = self.get(key)
+            return bundle if bundle is not None else compute_bundle(db)
+        
+        try:
+            bundle = compute_bundle(db)
+            self.put(key, bundle)
+            return bundle
+        finally:
+            with self._lock:
+                self._pending.pop(key, None)
+            pending.set()
+
+    def remember_token(self, token, db):
+        """Indexes a share token (see share.py) against the bundle of the vault it encodes."""
+        tkey, key = share.token_hash(token), bundle_key(db)
+        with self._lock:
+            self._shared[tkey] = key
+            self._shared.move_to_end(tkey)
+            while len(self._shared) > self.max_entries:
+                self._shared.popitem(last=False)
+
+    def get_shared(self, token):
+        """The bundle behind a share token, or None if it was never indexed or has been evicted."""
+        with self._lock:
+            key = self._shared.get(share.token_hash(token))
+        return self.get(key) if key is not None else None
+
+    def warm(self, vaults):
+        """Precomputes bundles for `vaults` on a daemon thread; returns the thread."""
+        def run():
+            for db in vaults:
+                self.get_or_compute(db)
+        t = threading.Thread(target=run, name="result-store-warm", daemon=True)
+        t.start()
+        return t
+
+    def speculate(self, db, cancel, budget=SPECULATION_CPU_BUDGET, steps=NEIGHBOUR_STEPS):
+        """
+        Precomputes bundles for the neighbour vaults of `db` on a daemon thread, most likely
+        edit first, while another bundle still fits in `budget` CPU seconds and `cancel`
+        (a threading.Event) isn't set. Waits for a free speculator slot first; returns the thread.
+        """
+        db = dict(db)  # The wizard keeps editing the live vault
+        def run():
+            while not self._speculators.acquire(timeout=0.2):
+                if cancel.is_set():
+                    return
+            try:
+                start = time.thread_time()
+                bundle_cost = 0.0  # Dearest bundle so far; one can't be interrupted once started
+                for nb in neighbour_vaults(db, steps):
+                    spent = time.thread_time() - start
+                    if cancel.is_set() or spent + bundle_cost > budget:
+                        return
+                    self.get_or_compute(nb)
+                    bundle_cost = max(bundle_cost, time.thread_time() - start - spent)
+            finally:
+                self._speculators.release()
+        t = threading.Thread(target=run, name="result-store-speculate", daemon=True)
+        t.start()
+        return t
+
+class Speculation:
+    """
+    One session's speculation. Keep it in the session state: starting again around new
+    inputs cancels the previous run, and once the session ends and this object is
+    collected, the running speculation is cancelled too.
+    """
+    def __init__(self, store):
+        self.store = store
+        self.key = None
+        self.thread = None
+        self._cancel = [threading.Event()]
+        weakref.finalize(self, lambda cancel: cancel[0].set(), self._cancel)
+
+    def start(self, db):
+        key = bundle_key(db)
+        if key == self.key:
+            return self.thread
+        self.stop()
+        self._cancel[0] = threading.Event()
+        self.key = key
+        self.thread = self.store.speculate(db, self._cancel[0])
+        return self.thread
+
+    def stop(self):
+        self._cancel[0].set()
@@ -0,0 +1,107 @@
+"""
+🎲 CORRELATED RETURN MODEL
+Yearly shocks for every asset class plus general and rent inflation, drawn jointly
+from one covariance matrix so that, e.g., FD rates and inflation move together and
+equity is not "diversified" by independent draws. Optional fat tails (multivariate
+Student-t) and Markov regime switching. Paths come out as [paths, years, factors]
+tensors in bounded-size chunks, so 100k+ paths never sit in memory at once.
+"""
+import numpy as np
+
+FACTORS = ("equity", "gold", "fd", "arbitrage", "epf", "cash", "inflation", "rent_inflation")
+
+# Annual volatility of each factor around its deterministic (input) rate
+DEFAULT_VOLS = {
+    "equity": 0.18, "gold": 0.15, "fd": 0.012, "arbitrage": 0.015,
+    "epf": 0.004, "cash": 0.006, "inflation": 0.015, "rent_inflation": 0.025,
+}
+
+# Correlations between factors; unlisted pairs are uncorrelated
+DEFAULT_CORRELATIONS = {
+    ("equity", "gold"): -0.10, ("equity", "inflation"): -0.20, ("equity", "arbitrage"): 0.20,
+    ("fd", "inflation"): 0.60, ("fd", "rent_inflation"): 0.35, ("fd", "cash"): 0.70, ("fd", "arbitrage"): 0.50, ("fd", "epf"): 0.40,
+    ("cash", "arbitrage"): 0.40, ("cash", "epf"): 0.30, ("arbitrage", "epf"): 0.20,
+    ("cash", "inflation"): 0.40, ("arbitrage", "inflation"): 0.30, ("epf", "inflation"): 0.25,
+    ("gold", "inflation"): 0.30, ("inflation", "rent_inflation"): 0.60,
+}
+
+# Example two-state regime model: calm markets and a stress regime with lower
+# equity returns, higher inflation and wider swings everywhere
+STRESS_REGIMES = {
+    "states": ("calm", "stress"),
+    "transition": [[0.92, 0.08], [0.35, 0.65]],
+    "vol_scale": (1.0, 1.8),
+    "shift": ({}, {"equity": -0.10, "gold": 0.03, "inflation": 0.02, "rent_inflation": 0.02}),
+}
+
+CHUNK_PATHS = 10000
+RATE_FLOOR = -0.95  # A draw can lose at most 95% of a bucket in one year
+
+def correlation_matrix(correlations=None):
+    corr = np.eye(len(FACTORS))
+    for (a, b), rho in (DEFAULT_CORRELATIONS if correlations is None else correlations).items():
+        i, j = FACTORS.index(a), FACTORS.index(b)
+        corr[i, j] = corr[j, i] = rho
+    return corr
+
+class ReturnModel:
+    """
+    Covariance = diag(vols) @ corr @ diag(vols), factored once (Cholesky).
+    dist: "normal" or "t" (Student-t with `dof`, rescaled to the same covariance).
+    regimes: None or a dict shaped like STRESS_REGIMES.
+    """
+    def __init__(self, vols=None, correlations=None, dist="normal", dof=5, regimes=None):
+        if dist not in ("normal", "t"):
+            raise ValueError(f"Unknown return distribution: {dist}")
+        if dist == "t" and dof <= 2:
+            raise ValueError("Student-t needs dof > 2 for a finite covariance")
+        self.vols = np.array([dict(DEFAULT_VOLS, **(vols or {}))[f] for f in FACTORS])
+        self.corr = correlation_matrix(correlations)
+        try:
+            self.chol = np.linalg.cholesky(self.corr)
+        except np.linalg.LinAlgError:
+            raise ValueError("Correlation matrix must be positive definite")
+        self.dist, self.dof = dist, dof
+        self.regimes = regimes
+        if regimes:
+            self.transition = np.asarray(regimes["transition"], dtype=float)
+            self.vol_scale = np.asarray(regimes["vol_scale"], dtype=float)
+            self.shift = np.array([[s.get(f, 0.0) for f in FACTORS] for s in regimes["shift"]])
+
+    @property
+    def covariance(self):
+        return self.corr * np.outer(self.vols, self.vols)
+
+    def regime_paths(self, n, years, rng):
+        """[n, years] int array of regime states, starting from the chain's stationary mix."""
+        k = len(self.vol_scale)
+        evals, evecs = np.linalg.eig(self.transition.T)
+        stationary = np.real(evecs[:, np.argmin(np.abs(evals - 1))])
+        stationary = stationary / stationary.sum()
+        cum = np.cumsum(self.transition, axis=1)
+        states = np.empty((n, years), dtype=np.int8)
+        states[:, 0] = np.minimum(np.searchsorted(np.cumsum(stationary), rng.random(n)), k - 1)
+        u = rng.random((n, years))
+        for t in range(1, years):
+            row = cum[states[:, t - 1]]
+            states[:, t] = np.minimum((u[:, t, None] > row).sum(axis=1), k - 1)
+        return states
+
+    def shocks(self, n, years, rng):
+        """One [n, years, factors] tensor of zero-mean (before regime shifts) correlated shocks."""
+        z = rng.standard_normal((n, years, len(FACTORS))) @ self.chol.T
+        if self.dist == "t":
+            w = rng.chisquare(self.dof, size=(n, years, 1)) / self.dof
+            z *= np.sqrt((self.dof - 2) / self.dof) / np.sqrt(w)
+        z *= self.vols
+        if self.regimes:
+            states = self.regime_paths(n, years, rng)
+            z *= self.vol_scale[states][..., None]
+            z += self.shift[states]
+        return z
+
+    def iter_shocks(self, n_paths, years, chunk=CHUNK_PATHS, seed=None):
+        """Yields shock tensors of at most `chunk` paths; reproducible for a given seed."""
+        rng = np.random.default_rng(seed)
+        for start in range(0, n_paths, chunk):
+            yield self.shocks(min(chunk, n_paths - start), years, rng)
@@ -0,0 +1,208 @@
+"""
+🔗 SHAREABLE PLAN TOKENS
+Packs the whole wizard vault (plus the currency) into a short URL-safe token: values in
+a fixed key order, one tag byte each, varints for whole numbers, zlib on top and
+base64url without padding. Decoding returns the exact vault (ints stay ints, floats stay
+floats), so a shared plan hashes to the same result-store entry as the original, and
+checks every value against the wizard's schema before it reaches the session.
+"""
+import base64
+import binascii
+import hashlib
+import math
+import struct
+import zlib
+
+import calculator
+import taxes
+
+TOKEN_VERSION = 1
+MAX_TOKEN_LEN = 4096
+MAX_PLAN_BYTES = 64 * 1024  # Decompressed size cap, so a crafted token can't balloon
+
+# Append-only: a token from before a key existed simply ends early
+VAULT_KEYS = (
+    "persona", "age", "retire_age", "dependents", "income", "monthly_pf", "living_expense", "rent",
+    "tax_slab_idx", "use_post_tax", "cash", "fd", "credit_limit", "emi", "term_insurance", "health_insurance",
+    "epf", "mutual_funds", "stocks", "gold", "arbitrage", "fixed_income", "step_up", "inflation",
+    "housing_idx", "house_cost", "rent_inflation", "rate_sip", "rate_equity", "rate_fd_gross", "rate_epf",
+    "rate_gold", "rate_arbitrage", "rate_fixed", "current_sip",
+    "loan_principal", "loan_rate", "loan_tenure",
+    "house_age", "house_down_pct", "house_loan_rate", "house_loan_tenure",
+    "goals",
+    "tax_regime", "tax_deductions",
+)
+GOAL_KEYS = ("name", "age", "amount", "years", "inflation", "bucket")
+
+# The wizard's schema a decoded vault must fit, so a crafted token can't put values in
+# the session that its widgets (or the engine) can't take
+MAX_MONEY = 1e15
+MONEY_KEYS = (
+    "income", "monthly_pf", "living_expense", "rent", "cash", "fd", "credit_limit", "emi", "term_insurance",
+    "health_insurance", "epf", "mutual_funds", "stocks", "gold", "arbitrage", "fixed_income", "house_cost",
+    "current_sip", "loan_principal", "tax_deductions",
+)
+RATE_KEYS = ("rate_sip", "rate_equity", "rate_fd_gross", "rate_epf", "rate_gold", "rate_arbitrage", "rate_fixed")
+NUMBER_RANGES = {
+    "age": (18, 99), "retire_age": (18, 99), "dependents": (0, 10), "step_up": (0, 50),
+    "inflation": (0, 20), "rent_inflation": (0, 20), "loan_rate": (0, 40), "loan_tenure": (0, 40),
+    "house_age": (0, 100), "house_down_pct": (0, 100), "house_loan_rate": (0, 25), "house_loan_tenure": (1, 30),
+    **{k: (0, MAX_MONEY) for k in MONEY_KEYS}, **{k: (-100, 100) for k in RATE_KEYS},
+}
+INDEX_KEYS = {"tax_slab_idx": len(calculator.TAX_SLAB_OPTIONS), "housing_idx": len(calculator.HOUSING_OPTIONS)}
+CHOICE_KEYS = {"tax_regime": taxes.REGIMES}
+GOAL_RANGES = {"age": (0, 100), "amount": (0, MAX_MONEY), "years": (1, 40), "inflation": (0, 25)}
+MAX_GOALS = 50
+MAX_TEXT = 100
+
+MISSING, NONE, FALSE, TRUE, INT, WHOLE_FLOAT, FLOAT, STR, GOAL_LIST = range(9)
+
+# ==========================================
+# 📦 VALUE PACKING
+# ==========================================
+def _varint(n):
+    n = (n << 1) ^ (n >> 63)  # zigzag, so small negatives stay small
+    out = bytearray()
+    while True:
+        byte = n & 0x7F
+        n >>= 7
+        if n:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return bytes(out)
+
+def _read_varint(buf, pos):
+    n = shift = 0
+    while True:
+        byte = buf[pos]
+        pos += 1
+        n |= (byte & 0x7F) << shift
+        shift += 7
+        if not byte & 0x80:
+            return (n >> 1) ^ -(n & 1), pos
+
+def _pack(value):
+    if value is None:
+        return bytes([NONE])
+    if isinstance(value, bool):
+        return bytes([TRUE if value else FALSE])
+    if isinstance(value, int) and -2**62 <= value < 2**62:
+        return bytes([INT]) + _varint(value)
+    if isinstance(value, float):
+        if value.is_integer() and abs(value) < 2**62:
+            return bytes([WHOLE_FLOAT]) + _varint(int(value))
+        return bytes([FLOAT]) + struct.pack("<d", value)
+    if isinstance(value, str):
+        raw = value.encode("utf-8")
+        return bytes([STR]) + _varint(len(raw)) + raw
+    if isinstance(value, list):
+        return bytes([GOAL_LIST]) + _varint(len(value)) + b"".join(
+            _pack(g.get(k)) for g in value for k in GOAL_KEYS)
+    raise ValueError(f"Can't put a {type(value).__name__} in a plan token")
+
+def _unpack(buf, pos):
+    tag = buf[pos]
+    pos += 1
+    if tag in (MISSING, NONE):
+        return None, pos
+    if tag in (FALSE, TRUE):
+        return tag == TRUE, pos
+    if tag == INT:
+        return _read_varint(buf, pos)
+    if tag == WHOLE_FLOAT:
+        n, pos = _read_varint(buf, pos)
+        return float(n), pos
+    if tag == FLOAT:
+        return struct.unpack_from("<d", buf, pos)[0], pos + 8
+    if tag == STR:
+        n, pos = _read_varint(buf, pos)
+        return bytes(buf[pos:pos + n]).decode("utf-8"), pos + n
+    if tag == GOAL_LIST:
+        n, pos = _read_varint(buf, pos)
+        goals = []
+        for _ in range(n):
+            goal = {}
+            for k in GOAL_KEYS:
+                goal[k], pos = _unpack(buf, pos)
+            goals.append(goal)
+        return goals, pos
+    raise ValueError(f"Unknown value tag {tag}")
+
+# ==========================================
+# 🛡️ SCHEMA CHECKS
+# ==========================================
+def _is_number(value, lo, hi):
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value) and lo <= value <= hi
+
+def _is_text(value):
+    return isinstance(value, str) and len(value) <= MAX_TEXT
+
+def _check_goal(goal):
+    for k, (lo, hi) in GOAL_RANGES.items():
+        if goal[k] is not None and not _is_number(goal[k], lo, hi):
+            return False
+    return (goal["name"] is None or _is_text(goal["name"])) and goal["bucket"] in (None,) + calculator.GOAL_BUCKETS
+
+def validate_vault(db):
+    """Raises ValueError unless every key of a vault (decoded, or posted to the API) has a value its wizard input accepts."""
+    for key, value in db.items():
+        if key in NUMBER_RANGES:
+            ok = _is_number(value, *NUMBER_RANGES[key])
+        elif key in INDEX_KEYS:
+            ok = _is_number(value, 0, INDEX_KEYS[key] - 1) and value == int(value)
+        elif key in CHOICE_KEYS:
+            ok = value in CHOICE_KEYS[key]
+        elif key == "use_post_tax":
+            ok = isinstance(value, bool)
+        elif key == "persona":
+            ok = _is_text(value)
+        elif key == "goals":
+            ok = isinstance(value, list) and len(value) <= MAX_GOALS and all(_check_goal(g) for g in value)
+        else:
+            ok = False
+        if not ok:
+            raise ValueError(f"Invalid value for {key}")
+
+# ==========================================
+# 🔗 TOKENS
+# ==========================================
+def encode_plan(db, currency):
+    """URL-safe token for a wizard vault and its currency label."""
+    body = bytearray([TOKEN_VERSION]) + _pack(currency)
+    for key in VAULT_KEYS:
+        body += _pack(db[key]) if key in db else bytes([MISSING])
+    return base64.urlsafe_b64encode(zlib.compress(bytes(body), 9)).rstrip(b"=").decode("ascii")
+
+def decode_plan(token, currencies=None):
+    """
+    (vault, currency) from a token; raises ValueError for anything malformed, any value
+    outside the wizard's schema, or a currency not in `currencies` (when given).
+    """
+    try:
+        if len(token) > MAX_TOKEN_LEN:
+            raise ValueError("Token too long")
+        inflater = zlib.decompressobj()
+        buf = inflater.decompress(base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)), MAX_PLAN_BYTES)
+        if inflater.unconsumed_tail:
+            raise ValueError("Token too large")
+        if buf[0] != TOKEN_VERSION:
+            raise ValueError(f"Unsupported token version {buf[0]}")
+        currency, pos = _unpack(buf, 1)
+        db = {}
+        for key in VAULT_KEYS:
+            if pos >= len(buf):
+                break
+            missing = buf[pos] == MISSING
+            value, pos = _unpack(buf, pos)
+            if not missing:
+                db[key] = value
+        validate_vault(db)
+        if currencies is not None and currency not in currencies:
+            raise ValueError(f"Unknown currency {currency!r} in plan token")
+        return db, currency
+    except (binascii.Error, zlib.error, struct.error, IndexError, UnicodeDecodeError, TypeError) as e:
+        raise ValueError(f"Invalid plan token: {e}")
+
+def token_hash(token):
+    return hashlib.sha256(token.encode("ascii")).hexdigest()
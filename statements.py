@@ -0,0 +1,420 @@
+"""
+📥 PORTFOLIO STATEMENT IMPORTER
+Streams consolidated account statements and broker exports (CSV, or XLSX via
+openpyxl's read-only mode) row by row and folds them into the wizard's vault keys:
+current value per asset class, plus the monthly SIP implied by recurring purchases.
+
+Only per-holding state is kept (units, last price, net invested, and a few months of
+purchases for SIP detection), so memory is bounded by the number of holdings, not by
+the number of transactions or years in the statement.
+
+Header rows are found by column name (preamble lines are skipped, repeated headers
+re-map). A file with a transaction-type column, or with dates but no market-value
+column, is read as a transaction history; anything else as a holdings snapshot.
+"""
+import csv
+import io
+import re
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+
+import pandas as pd
+
+ASSET_KEYS = ("mutual_funds", "stocks", "gold", "epf", "fd", "arbitrage", "fixed_income")
+
+# Header aliases, compared after lower-casing and collapsing punctuation to spaces
+COLUMN_ALIASES = {
+    "date": ("date", "transaction date", "trade date", "txn date", "value date", "nav date", "order date", "order execution time"),
+    "name": ("scheme", "scheme name", "fund", "fund name", "security", "security name", "instrument", "stock", "symbol",
+             "scrip", "scrip name", "company", "company name", "description", "holding", "asset name", "name", "particulars"),
+    "isin": ("isin", "isin code", "isin no"),
+    "folio": ("folio", "folio no", "folio number"),
+    "asset": ("asset class", "asset type", "asset category", "category", "product", "instrument type", "segment"),
+    "txn": ("transaction type", "txn type", "type", "transaction", "action", "buy sell", "trade type", "side", "nature"),
+    "amount": ("amount", "transaction amount", "net amount", "trade value", "investment amount", "gross amount", "amount inr", "amount rs"),
+    "units": ("units", "quantity", "qty", "no of units", "shares", "closing units", "balance units", "unit balance"),
+    "price": ("nav", "price", "rate", "trade price", "nav rs", "ltp", "market price", "closing price", "current price", "closing nav"),
+    "value": ("market value", "current value", "closing value", "value", "valuation", "holding value", "mkt value",
+              "cur val", "current market value", "closing market value", "market value rs", "present value"),
+}
+_ALIAS_TO_FIELD = {alias: field for field, aliases in COLUMN_ALIASES.items() for alias in aliases}
+
+# First match wins, so gold/arbitrage/debt funds don't land in mutual_funds
+ASSET_PATTERNS = (
+    ("epf", r"\b(epf|epfo|pf|ppf|nps|provident|pension)\b"),
+    ("fd", r"\b(fd|fds|fixed deposit|term deposit|recurring deposit)\b"),
+    ("gold", r"\b(gold|goldbees|goldetf|sgb|sovereign gold)\b"),
+    ("arbitrage", r"\barbitrage\b"),
+    ("fixed_income", r"\b(debt|bonds?|gilt|liquid|money market|overnight|g sec|gsec|treasury|t bill|liquidbees|ncd|banking psu|corporate bond|credit risk|income fund)\b"),
+    ("mutual_funds", r"\b(fund|funds|mutual|mf|scheme|growth|idcw|elss|flexi ?cap|large ?cap|mid ?cap|small ?cap|index)\b"),
+)
+_ASSET_RES = tuple((key, re.compile(pat)) for key, pat in ASSET_PATTERNS)
+
+SELL_RE = re.compile(r"\b(sell|sold|sale|redemption|redeem|redeemed|switch out|withdrawal|swp|transfer out|stp out)\b")
+BUY_RE = re.compile(r"\b(buy|bought|purchase|sip|systematic|switch in|investment|subscription|allotment|transfer in|stp in|reinvest|reinvestment)\b")
+TXN_CODES = {"s": -1, "b": 1}  # Single-letter side columns; only a cell holding just the letter counts
+FOOTER_NAMES = {"total", "grand total", "sub total", "subtotal"}  # Summary rows under a holdings table
+IGNORE_RE = re.compile(r"\b(dividend|payout|stamp|stt|tds|tax|charges?|fee|fees|brokerage)\b")
+
+DATE_FORMATS = ("%Y-%m-%d", "%d-%m-%Y", "%d/%m/%Y", "%d-%b-%Y", "%d %b %Y", "%b %d, %Y", "%d-%b-%y", "%Y/%m/%d",
+                "%m/%d/%Y", "%d.%m.%Y", "%Y-%m-%dT%H:%M:%S", "%Y-%m-%d %H:%M:%S")
+EXCEL_EPOCH = date(1899, 12, 30)
+
+# Currency marks and labels around an amount, then exactly one number (Indian or Western grouping)
+CURRENCY_PREFIX_RE = re.compile(r"^(?:rs\.?|inr|usd|eur|gbp|₹|\$|€|£)\s*")
+CURRENCY_SUFFIX_RE = re.compile(r"\s*(?:rs\.?|inr|usd|eur|gbp)$")
+NUMBER_RE = re.compile(r"\d[\d,]*(?:\.\d*)?(?:e[-+]?\d+)?|\.\d+(?:e[-+]?\d+)?")
+
+HEADER_SCAN_CELLS = 40       # Wider rows than this are never taken for a header
+SIP_WINDOW_MONTHS = 12       # Months of purchases kept per holding
+SIP_MIN_INSTALMENTS = 3      # Consecutive monthly purchases that make a SIP
+SIP_AMOUNT_TOLERANCE = 0.10  # Instalments within ±10% of the latest one count as the same SIP
+MAX_BUYS_PER_MONTH = 4
+PARSE_CACHE = 4096           # Names, transaction types and dates repeat across thousands of rows
+DATE_SNIFF_ROWS = 200        # Rows of a file held back while looking for an unambiguous date
+
+# ==========================================
+# 🧹 CELL PARSING
+# ==========================================
+@lru_cache(maxsize=PARSE_CACHE)
+def _norm(text):
+    return " ".join(re.sub(r"[^a-z0-9]+", " ", str(text).lower()).split())
+
+def parse_amount(cell):
+    """
+    Number from a statement cell: '₹1,23,456.78', 'Rs. 1,000', '(1,000)', '2,500 Dr', 12.5 -> float.
+    None if blank, or if anything besides one number, a sign and currency labels is left.
+    """
+    if cell is None or isinstance(cell, bool):
+        return None
+    if isinstance(cell, (int, float)):
+        return float(cell)
+    text = str(cell).strip().lower()
+    negative = False
+    if text.startswith("(") and text.endswith(")"):
+        negative, text = True, text[1:-1].strip()
+    if text.endswith(("dr", "cr")):
+        negative, text = negative or text.endswith("dr"), text[:-2].strip()
+    if not text[:1].isdigit() or not text[-1:].isdigit():
+        for _ in range(2):  # The sign may sit before or after the currency mark: '-₹500', '₹-500'
+            if text.startswith("-"):
+                negative, text = True, text[1:].strip()
+            text = CURRENCY_SUFFIX_RE.sub("", CURRENCY_PREFIX_RE.sub("", text)).strip()
+    if not NUMBER_RE.fullmatch(text):
+        return None
+    return -float(text.replace(",", "")) if negative else float(text.replace(",", ""))
+
+def _date_formats(text):
+    """The DATE_FORMATS that read `text` (two for 04/05/2024: DD/MM and MM/DD), at most two."""
+    hits = []
+    for fmt in DATE_FORMATS:
+        try:
+            datetime.strptime(text, fmt)
+        except ValueError:
+            continue
+        hits.append(fmt)
+        if len(hits) > 1:
+            break
+    return hits
+
+class DateParser:
+    """
+    Dates of one file (datetime, Excel serial or common text formats); None if unparseable.
+    The first unambiguous text date (see sniff) fixes the file's format, so 04/05/2024 reads
+    the same way as the file's 12/25/2024; until then DATE_FORMATS order decides (DD/MM
+    first). Text results are cached per parser, once the format is fixed.
+    """
+    def __init__(self):
+        self.fmt = None
+        self._cache = {}
+
+    def sniff(self, cells):
+        """Fixes the format from the first unambiguous date-like text cell of a row; True once fixed."""
+        for cell in cells:
+            if self.fmt is not None:
+                break
+            if isinstance(cell, str) and 8 <= len(cell.strip()) and cell.strip()[:1].isalnum():
+                hits = _date_formats(cell.strip()[:19])
+                if len(hits) == 1:
+                    self.fmt = hits[0]
+        return self.fmt is not None
+
+    def __call__(self, cell):
+        if cell is None or isinstance(cell, bool):
+            return None
+        if isinstance(cell, datetime):
+            return cell.date()
+        if isinstance(cell, date):
+            return cell
+        if isinstance(cell, (int, float)):
+            return EXCEL_EPOCH + timedelta(days=int(cell)) if 20000 < cell < 80000 else None
+        text = str(cell).strip()[:19]
+        if text in self._cache:
+            return self._cache[text]
+        if self.fmt is not None:
+            try:
+                parsed = datetime.strptime(text, self.fmt).date()
+            except ValueError:
+                parsed = None
+            if parsed is not None:
+                if len(self._cache) < PARSE_CACHE:
+                    self._cache[text] = parsed
+                return parsed
+        for fmt in DATE_FORMATS:
+            try:
+                parsed = datetime.strptime(text, fmt).date()
+            except ValueError:
+                continue
+            if self.fmt is None and len(_date_formats(text)) == 1:
+                self.fmt = fmt
+            return parsed
+        return None
+
+def classify_asset(name, asset="", isin=""):
+    """Vault key for a holding from its asset-class column, name and ISIN (INF... is a mutual fund)."""
+    for text in (asset, name):
+        text = _norm(text or "")
+        for key, pattern in _ASSET_RES:
+            if pattern.search(text):
+                return key
+    return "mutual_funds" if str(isin or "").upper().startswith("INF") else "stocks"
+
+@lru_cache(maxsize=PARSE_CACHE)
+def _txn_keyword_side(txn):
+    text = _norm(txn)
+    if text in TXN_CODES:
+        return TXN_CODES[text]
+    if SELL_RE.search(text):
+        return -1
+    if BUY_RE.search(text):
+        return 1
+    if IGNORE_RE.search(text):
+        return 0
+    return None
+
+def _txn_side(txn, amount, units):
+    """+1 buy, -1 sell, 0 for rows that don't move holdings (dividends paid out, taxes, charges)."""
+    side = _txn_keyword_side(str(txn)) if txn else None
+    if side is not None:
+        return side
+    signed = units if units else amount
+    return -1 if signed is not None and signed < 0 else 1
+
+# ==========================================
+# 📄 ROW SOURCES
+# ==========================================
+def iter_csv_rows(file):
+    """Rows (lists of cells) of a CSV/TSV upload, path or text stream; the delimiter is sniffed."""
+    if isinstance(file, str):
+        with open(file, newline="", encoding="utf-8-sig", errors="replace") as f:
+            yield from iter_csv_rows(f)
+        return
+    stream = file if isinstance(file, io.TextIOBase) else io.TextIOWrapper(file, encoding="utf-8-sig", errors="replace", newline="")
+    sample = stream.read(8192)
+    stream.seek(0)
+    try:
+        dialect = csv.Sniffer().sniff(sample, delimiters=",;\t|")
+    except csv.Error:
+        dialect = csv.excel
+    yield from csv.reader(stream, dialect)
+
+def iter_xlsx_rows(file):
+    """Rows of every sheet of an XLSX workbook, read lazily (openpyxl read-only mode)."""
+    import openpyxl
+    wb = openpyxl.load_workbook(file, read_only=True, data_only=True)
+    try:
+        for ws in wb.worksheets:
+            for row in ws.iter_rows(values_only=True):
+                yield list(row)
+    finally:
+        wb.close()
+
+def iter_rows(file, filename=None):
+    name = (filename or getattr(file, "name", None) or (file if isinstance(file, str) else "")).lower()
+    return iter_xlsx_rows(file) if name.endswith((".xlsx", ".xlsm")) else iter_csv_rows(file)
+
+# ==========================================
+# 🧮 STREAMING AGGREGATION
+# ==========================================
+def _new_holding(name, asset):
+    return {"name": name, "asset": asset, "value": None, "units": 0.0, "price": None, "invested": 0.0,
+            "last_buy_month": None, "buys": {}}
+
+def detect_sip(buys):
+    """Current monthly instalment from {month index: [buy amounts]}, or 0 if the latest months aren't a SIP."""
+    if not buys:
+        return 0.0
+    latest = max(buys)
+    best = 0.0
+    for ref in buys[latest]:
+        month, run = latest, 0
+        while any(abs(a - ref) <= SIP_AMOUNT_TOLERANCE * ref for a in buys.get(month, ())):
+            run += 1
+            month -= 1
+        if run >= SIP_MIN_INSTALMENTS:
+            best = max(best, ref)
+    return best
+
+class StatementImporter:
+    """
+    Feed it one or more statements (feed_file) or raw rows (feed_row), then read result().
+    Holdings are keyed by ISIN, else folio + name, else name.
+    """
+    def __init__(self):
+        self.holdings = {}
+        self.columns = None
+        self.mode = None
+        self.last_month = None
+        self.saw_transactions = False
+        self.stats = {"rows": 0, "used": 0, "skipped": 0}
+        self.parse_date = DateParser()
+
+    def _map_header(self, cells):
+        if len(cells) > HEADER_SCAN_CELLS:
+            return None
+        columns = {}
+        for i, cell in enumerate(cells):
+            field = _ALIAS_TO_FIELD.get(_norm(cell)) if isinstance(cell, str) else None
+            if field and field not in columns:
+                columns[field] = i
+        if "name" not in columns and "isin" not in columns:
+            return None
+        if not {"amount", "units", "value"} & columns.keys():
+            return None
+        return columns
+
+    def feed_file(self, file, filename=None):
+        self.columns = None  # Every file brings its own header and date format
+        self.parse_date = DateParser()
+        pending = []  # The first rows wait until the file's date format is known
+        for cells in iter_rows(file, filename):
+            if pending is None:
+                self.feed_row(cells)
+                continue
+            pending.append(cells)
+            if self.parse_date.sniff(cells) or len(pending) >= DATE_SNIFF_ROWS:
+                for held in pending:
+                    self.feed_row(held)
+                pending = None
+        for held in pending or ():
+            self.feed_row(held)
+
+    def _is_data(self, cells):
+        """True if the first filled number column holds a number (so the row can't be a repeated header)."""
+        for field in ("amount", "units", "value"):
+            i = self.columns.get(field)
+            cell = cells[i] if i is not None and i < len(cells) else None
+            if cell is None or cell == "":
+                continue
+            return isinstance(cell, (int, float)) or str(cell).lstrip()[:1] in "0123456789-(.₹$€£"
+        return False
+
+    def feed_row(self, cells):
+        self.stats["rows"] += 1
+        header = None if self.columns is not None and self._is_data(cells) else self._map_header(cells)
+        if header is not None:
+            self.columns = header
+            history = "txn" in header or ("date" in header and "value" not in header)
+            self.mode = "transactions" if history else "holdings"
+            return
+        if self.columns is None:
+            self.stats["skipped"] += 1
+            return
+
+        cell = lambda field: cells[self.columns[field]] if field in self.columns and self.columns[field] < len(cells) else None
+        name = str(cell("name") or "").strip()
+        isin = str(cell("isin") or "").strip().upper()
+        if (not name and not isin) or (not isin and _norm(name) in FOOTER_NAMES):
+            self.stats["skipped"] += 1
+            return
+        folio = str(cell("folio") or "").strip()
+        key = isin or (f"{folio}|{_norm(name)}" if folio else _norm(name))
+        holding = self.holdings.get(key)
+        if holding is None:
+            holding = self.holdings[key] = _new_holding(name or isin, classify_asset(name, cell("asset"), isin))
+
+        amount, units, price = parse_amount(cell("amount")), parse_amount(cell("units")), parse_amount(cell("price"))
+        if self.mode == "holdings":
+            value = parse_amount(cell("value"))
+            if value is None:
+                value = units * price if units is not None and price is not None else amount
+            if value is None:
+                self.stats["skipped"] += 1
+                return
+            holding["value"] = (holding["value"] or 0.0) + value
+            self.stats["used"] += 1
+            return
+
+        if amount is None and "value" in self.columns:
+            amount = parse_amount(cell("value"))
+        if amount is None and units is not None and price is not None:
+            amount = units * price
+        if amount is None and units is None:
+            self.stats["skipped"] += 1
+            return
+        side = _txn_side(cell("txn"), amount, units)
+        if side == 0:
+            self.stats["skipped"] += 1
+            return
+        self.saw_transactions = True
+        self.stats["used"] += 1
+        amount, units = abs(amount or 0.0), abs(units or 0.0)
+        if units and amount:
+            price = amount / units
+        if price:
+            holding["price"] = price
+        holding["units"] += side * units
+        holding["invested"] += side * amount
+
+        when = self.parse_date(cell("date"))
+        if when is None:
+            return
+        month = when.year * 12 + when.month - 1
+        self.last_month = month if self.last_month is None else max(self.last_month, month)
+        if side < 0 or not amount:
+            return
+        # Keep only the latest SIP_WINDOW_MONTHS months of purchases, in any row order
+        buys = holding["buys"]
+        if month not in buys:
+            if len(buys) >= SIP_WINDOW_MONTHS:
+                oldest = min(buys)
+                if month < oldest:
+                    return
+                del buys[oldest]
+            buys[month] = []
+        if len(buys[month]) < MAX_BUYS_PER_MONTH:
+            buys[month].append(amount)
+
+    def holding_value(self, h):
+        if h["value"] is not None:
+            return h["value"]
+        if h["units"] > 1e-9 and h["price"]:
+            return h["units"] * h["price"]
+        return max(h["invested"], 0.0)
+
+    def holding_sip(self, h):
+        # A SIP that skipped the statement's last two months has stopped
+        if not h["buys"] or self.last_month is None or max(h["buys"]) < self.last_month - 1:
+            return 0.0
+        return detect_sip(h["buys"])
+
+    def result(self):
+        """(vault updates, holdings DataFrame). Updates only name the asset classes found (and current_sip if the
+        statements had transactions), so other wizard inputs keep their typed values."""
+        rows = [{"Holding": h["name"], "Asset Class": h["asset"], "Value": self.holding_value(h), "Monthly SIP": self.holding_sip(h)}
+                for h in self.holdings.values()]
+        holdings = pd.DataFrame(rows, columns=["Holding", "Asset Class", "Value", "Monthly SIP"])
+        updates = {}
+        for row in rows:
+            updates[row["Asset Class"]] = updates.get(row["Asset Class"], 0.0) + row["Value"]
+        updates = {k: int(round(updates[k])) for k in ASSET_KEYS if k in updates}
+        if self.saw_transactions:
+            updates["current_sip"] = int(round(sum(row["Monthly SIP"] for row in rows)))
+        return updates, holdings.sort_values("Value", ascending=False, ignore_index=True)
+
+def import_statements(files):
+    """(vault updates, holdings DataFrame) for a list of uploads/paths; see StatementImporter."""
+    importer = StatementImporter()
+    for f in files:
+        importer.feed_file(f)
+    return importer.result()
@@ -1,13 +1,17 @@
+import numpy as np
+
 # ==========================================
 # 🇮🇳 INDIAN TAX CONFIGURATION & ENGINE
 # Update these constants annually after the Union Budget
 # ==========================================
 
 # --- CURRENT BUDGET CONSTANTS ---
+TAX_VERSION = "FY2024-25"  # Bump with every budget update; stored results are re-scored against it
 LTCG_EQUITY = 0.125       # 12.5% Long Term Capital Gains on Equity
 LTCG_ARBITRAGE = 0.125    # 12.5% Tax on Arbitrage Funds
 LTCG_GOLD = 0.125         # 12.5% Tax on Financial Gold (SGBs, ETFs)
 CESS = 0.04               # 4% Health and Education Cess
+TOP_SLAB_RATE = 0.30      # Highest New Regime slab; caps the average tax rate on any income
 
 def calculate_india_tax(income):
     """
@@ -21,7 +25,7 @@ def calculate_india_tax(income):
     rem = income
     
     if rem > 1500000:
-        tax += (rem - 1500000) * 0.30
+        tax += (rem - 1500000) * TOP_SLAB_RATE
         rem = 1500000
     if rem > 1200000:
         tax += (rem - 1200000) * 0.20
@@ -37,6 +41,117 @@ def calculate_india_tax(income):
         
     return tax * (1 + CESS)
 
+# (lower bound, rate) from the top slab down, mirroring calculate_india_tax
+NEW_REGIME_SLABS = [(1500000, TOP_SLAB_RATE), (1200000, 0.20), (900000, 0.15), (600000, 0.10), (300000, 0.05)]
+NEW_REGIME_REBATE_LIMIT = 700000
+
+def calculate_india_tax_vec(income):
+    """
+    Array version of calculate_india_tax for batched/stochastic runs. Uses the same
+    top-down slab arithmetic so results match the scalar function exactly.
+    """
+    income = np.asarray(income, dtype=float)
+    tax = np.zeros_like(income)
+    rem = income
+    for lower, rate in NEW_REGIME_SLABS:
+        tax = tax + np.where(rem > lower, (rem - lower) * rate, 0.0)
+        rem = np.minimum(rem, lower)
+    return np.where(income <= NEW_REGIME_REBATE_LIMIT, 0.0, tax * (1 + CESS))
+
+# ==========================================
+# 🧾 OLD REGIME & REGIME CHOICE
+# Old-regime slabs start at an age-dependent exemption and allow deductions (80C, 80D,
+# HRA, home-loan interest, ...), given per profile as one yearly total. In retirement
+# only the investment/health part survives (capped), plus 80TTB on interest from 60.
+# ==========================================
+REGIMES = ("new", "old")
+OLD_REGIME_SLABS = [(1000000, TOP_SLAB_RATE), (500000, 0.20)]  # The 5% slab starts at the exemption below
+OLD_REGIME_EXEMPTION = [(80, 500000), (60, 300000), (0, 250000)]  # (from age, exempt income)
+OLD_REGIME_REBATE_LIMIT = 500000
+STANDARD_DEDUCTION = {"new": 75000, "old": 50000}  # On salary and pension, not on interest
+SENIOR_AGE = 60
+SENIOR_INTEREST_DEDUCTION = 50000  # 80TTB
+RETIRED_DEDUCTION_CAP = 200000     # 80C (1.5L) + 80D for a senior (50k)
+
+def old_regime_exemption(age):
+    return next(exempt for from_age, exempt in OLD_REGIME_EXEMPTION if age >= from_age)
+
+def calculate_old_regime_tax(income, age=0, deductions=0.0):
+    """Old Regime tax on `income` after `deductions`, with the exemption for `age`."""
+    taxable = income - deductions
+    if taxable <= OLD_REGIME_REBATE_LIMIT:
+        return 0.0  # 87A Rebate
+    tax = 0.0
+    rem = taxable
+    for lower, rate in OLD_REGIME_SLABS + [(old_regime_exemption(age), 0.05)]:
+        if rem > lower:
+            tax += (rem - lower) * rate
+            rem = lower
+    return tax * (1 + CESS)
+
+def interest_deduction(deductions, age):
+    """Old-regime deductions still available against interest income in retirement."""
+    return min(deductions, RETIRED_DEDUCTION_CAP) + (SENIOR_INTEREST_DEDUCTION if age >= SENIOR_AGE else 0.0)
+
+def interest_tax(interest, regime="new", age=0, deductions=0.0):
+    """Tax on a retiree's interest income (e.g. FD interest) under `regime`."""
+    if regime == "old":
+        return calculate_old_regime_tax(interest, age, interest_deduction(deductions, age))
+    return calculate_india_tax(interest)
+
+def interest_tax_levels(old, deductions):
+    """
+    Per-row slab levels for interest_tax_vec, built once per batch: each row on its own
+    regime (`old`: bool array) with its own deductions. Both regimes share one padded set
+    of levels, so a mixed batch costs about the same per year as a single-regime one.
+    None when every row is on the New Regime.
+    """
+    if not old.any():
+        return None
+    pad = len(NEW_REGIME_SLABS) - len(OLD_REGIME_SLABS) - 1
+    old_slabs = OLD_REGIME_SLABS[:1] * pad + OLD_REGIME_SLABS  # Repeated top slab adds nothing
+    return {
+        "old": old,
+        "deduction": np.where(old, np.minimum(deductions, RETIRED_DEDUCTION_CAP), 0.0),
+        "slabs": [(np.where(old, ol, l), np.where(old, orate, r)) for (l, r), (ol, orate) in zip(NEW_REGIME_SLABS, old_slabs)],
+        "rebate_limit": np.where(old, OLD_REGIME_REBATE_LIMIT, NEW_REGIME_REBATE_LIMIT),
+    }
+
+def interest_tax_vec(interest, age, levels):
+    """interest_tax for arrays at per-row `age`; `levels` from interest_tax_levels. New-regime rows match calculate_india_tax_vec exactly."""
+    if levels is None:
+        return calculate_india_tax_vec(interest)
+    old, senior = levels["old"], age >= SENIOR_AGE
+    taxable = interest - (levels["deduction"] + np.where(old & senior, SENIOR_INTEREST_DEDUCTION, 0.0))
+    exempt = np.where(age >= OLD_REGIME_EXEMPTION[0][0], OLD_REGIME_EXEMPTION[0][1], np.where(senior, OLD_REGIME_EXEMPTION[1][1], OLD_REGIME_EXEMPTION[2][1]))
+    tax = np.zeros_like(taxable)
+    rem = taxable
+    for lower, rate in levels["slabs"] + [(np.where(old, exempt, NEW_REGIME_SLABS[-1][0]), NEW_REGIME_SLABS[-1][1])]:
+        tax = tax + np.where(rem > lower, (rem - lower) * rate, 0.0)
+        rem = np.minimum(rem, lower)
+    return np.where(taxable <= levels["rebate_limit"], 0.0, tax * (1 + CESS))
+
+def salary_tax(gross, regime="new", age=0, deductions=0.0):
+    """Tax on a yearly gross salary: standard deduction in both regimes, the rest of `deductions` only in the old one."""
+    if regime == "old":
+        return calculate_old_regime_tax(gross, age, STANDARD_DEDUCTION["old"] + deductions)
+    return calculate_india_tax(gross - STANDARD_DEDUCTION["new"])
+
+SALARY_SEARCH_ITERS = 60
+
+def gross_salary(in_hand, regime="new", age=0, deductions=0.0):
+    """Yearly gross salary that leaves `in_hand` after salary_tax (lowest such salary, by bisection)."""
+    if in_hand <= 0:
+        return 0.0
+    low, high = in_hand, in_hand / (1 - TOP_SLAB_RATE * (1 + CESS)) + STANDARD_DEDUCTION["new"]
+    for _ in range(SALARY_SEARCH_ITERS):
+        mid = (low + high) / 2
+        if mid - salary_tax(mid, regime, age, deductions) >= in_hand:
+            high = mid
+        else:
+            low = mid
+    return high
+
 def calculate_post_tax_rate(rate, asset_type, tax_slab, use_post_tax):
     """
     Reduces the gross expected return of an asset by its specific tax drag.
@@ -0,0 +1,30 @@
+import os
+
+import pytest
+
+import personas
+import results_store
+
+AppTest = pytest.importorskip("streamlit.testing.v1").AppTest
+APP = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app.py")
+
+def _click(at, label):
+    next(b for b in at.button if label in b.label).click().run()
+
+def test_family_walkthrough_hits_warmed_bundle(monkeypatch):
+    computed = []
+    real = results_store.compute_bundle
+    monkeypatch.setattr(results_store, "compute_bundle", lambda db: computed.append(results_store.bundle_key(db)) or real(db))
+
+    at = AppTest.from_file(APP, default_timeout=300)
+    at.run()
+    _click(at, "The Family")
+    for label in ("Next: Safety", "Next: Invested", "Next: Strategy", "View Financial Reality"):
+        _click(at, label)
+    assert not at.exception
+    assert at.session_state["step"] == 5
+
+    # Step 4's goals editor must hand back a vault that hashes like the persona it started from
+    key = results_store.bundle_key(at.session_state["db"])
+    assert key == results_store.bundle_key(personas.PERSONAS["family"])
+    assert computed.count(key) == 1  # The start-up warm-up only
@@ -0,0 +1,47 @@
+import io
+
+import pytest
+
+import statements
+
+HOLDINGS_CSV = """Scheme Name,ISIN,Units,NAV,Market Value
+Parag Parikh Flexi Cap Fund - Direct Growth,INF879O01027,1000,75.5,75500
+Nippon India ETF Gold BeES,INF204KB17I5,800,50,40000
+Sub Total,,,,115500
+Total,,,,115500
+Grand Total,,,,115500
+"""
+
+def test_csv_footer_rows_are_not_holdings():
+    updates, holdings = statements.import_statements([io.BytesIO(HOLDINGS_CSV.encode())])
+    assert updates == {"mutual_funds": 75500, "gold": 40000}
+    assert len(holdings) == 2
+
+def test_footer_name_with_isin_is_a_holding():
+    imp = statements.StatementImporter()
+    for cells in (["Security", "ISIN", "Value"], ["Total", "INE002A01018", "1000"]):
+        imp.feed_row(cells)
+    assert imp.result()[0] == {"stocks": 1000}
+
+@pytest.fixture
+def holdings_xlsx(tmp_path):
+    openpyxl = pytest.importorskip("openpyxl")
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.append(["Consolidated Account Statement"])
+    ws.append([])
+    ws.append(["Scheme Name", "ISIN", "Units", "NAV", "Market Value"])
+    ws.append(["Parag Parikh Flexi Cap Fund - Direct Growth", "INF879O01027", 1000, 75.5, 75500])
+    ws.append(["Nippon India ETF Gold BeES", "INF204KB17I5", 800, 50, 40000])
+    ws.append(["Grand Total", None, None, None, 115500])
+    path = tmp_path / "holdings.xlsx"
+    wb.save(path)
+    return str(path)
+
+def test_xlsx_rows_match_csv(holdings_xlsx):
+    rows = list(statements.iter_rows(holdings_xlsx))
+    assert rows[2] == ["Scheme Name", "ISIN", "Units", "NAV", "Market Value"]
+    assert rows[3][4] == 75500
+    updates, holdings = statements.import_statements([holdings_xlsx])
+    assert updates == {"mutual_funds": 75500, "gold": 40000}
+    assert list(holdings["Holding"]) == ["Parag Parikh Flexi Cap Fund - Direct Growth", "Nippon India ETF Gold BeES"]